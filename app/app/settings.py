@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
@@ -39,7 +40,16 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.CachedJWTAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 #      'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
 #     'PAGE_SIZE': 3,
@@ -56,6 +66,7 @@ SPECTACULAR_SETTINGS = {
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -148,12 +159,129 @@ STATIC_URL = 'static/'
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 AUTHENTICATION_BACKENDS = (
-    'django.contrib.auth.backends.ModelBackend',  # Default authentication backend
+    # ModelBackend hashing in a process pool
+    'user.backends.PooledModelBackend',
 )
 
+# The first hasher hashes new passwords; the others still verify older
+# hashes, which are upgraded on the next login.
+PASSWORD_HASHERS = [
+    'user.hashers.TunableArgon2PasswordHasher',
+    'user.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+ARGON2_TIME_COST = 2
+ARGON2_MEMORY_COST = 65536
+ARGON2_PARALLELISM = 1
+
+SCRYPT_WORK_FACTOR = 2 ** 14
+SCRYPT_BLOCK_SIZE = 8
+SCRYPT_PARALLELISM = 1
+
+# Processes verifying passwords; 0 hashes on the request thread. Logins
+# beyond the workers plus PASSWORD_VERIFY_QUEUE waiting ones fail at
+# once; the token view answers them with a 503.
+PASSWORD_VERIFY_WORKERS = 2
+PASSWORD_VERIFY_QUEUE = 4
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
+# Largest list accepted by /api/recipe/recipes/bulk/
+RECIPE_BULK_MAX_ITEMS = 1000
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Cache alias and lifetime (seconds) of cached recipe/tag GET responses
+RECIPE_CACHE_ALIAS = 'default'
+RECIPE_CACHE_TIMEOUT = 300
+
+# Response compression (core.middleware): smallest body compressed in
+# bytes, and gzip level (1-9) / brotli quality (0-11), trading CPU for
+# smaller responses
+COMPRESSION_MIN_SIZE = 512
+COMPRESSION_GZIP_LEVEL = 6
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Incremental sync: seconds of overlap between successive sync windows,
+# and days deleted objects are remembered before a full resync is needed
+RECIPE_SYNC_OVERLAP = 5
+RECIPE_SYNC_TOMBSTONE_DAYS = 30
+
+# Per-process cache of authenticated users: seconds an entry is trusted
+# and the most entries kept
+AUTH_CACHE_TTL = 60
+AUTH_CACHE_MAX_ENTRIES = 10000
+
+# Authenticate safe recipe/tag requests from JWT claims alone, without
+# loading the user (see user.authentication.StatelessJWTAuthentication)
+JWT_STATELESS_READS = False
+# Seconds before a revocation (RevokedUser) reaches every process
+AUTH_REVOCATION_TTL = 5
+
+# Upstream APIs proxied by core.views
+USERS_API_URL = os.environ.get(
+    'USERS_API_URL', 'https://jsonplaceholder.typicode.com/users',
+)
+POSTS_API_URL = os.environ.get(
+    'POSTS_API_URL', 'https://jsonplaceholder.typicode.com/posts',
+)
+CAMERA_API_URL = os.environ.get('CAMERA_API_URL', 'http://192.168.1.13:8000')
+CAMERA_API_AUTH = (
+    os.environ.get('CAMERA_API_USER', 'root'),
+    os.environ.get('CAMERA_API_KEY', 'Accelx123456'),
+)
+# Camera servers fetched concurrently by core.cameras.refresh_sources();
+# a camera listed by several is kept under the first. timeout is the
+# read timeout of that source in seconds.
+CAMERA_SOURCES = [
+    {
+        'name': 'default',
+        'url': CAMERA_API_URL,
+        'auth': CAMERA_API_AUTH,
+        'timeout': 10,
+    },
+]
+CAMERA_FANOUT_WORKERS = 8
+# Seconds before /api/cameras/ refreshes a source in the background; the
+# refresh_cameras command can keep the snapshot fresher than that.
+CAMERA_REFRESH_INTERVAL = 60
+
+# On-disk cache of the JPEGs served by /api/cameras/<displayId>/snapshot/
+CAMERA_SNAPSHOT_DIR = os.environ.get(
+    'CAMERA_SNAPSHOT_DIR',
+    os.path.join(tempfile.gettempdir(), 'camera-snapshots'),
+)
+CAMERA_SNAPSHOT_MAX_BYTES = 256 * 1024 * 1024
+CAMERA_SNAPSHOT_TTL = 5
+CAMERA_SNAPSHOT_CHUNK_SIZE = 64 * 1024
+
+# Shared upstream HTTP client (core.http): timeouts in seconds, retries
+# of idempotent requests, and consecutive failures before a host's
+# circuit opens for UPSTREAM_BREAKER_RESET seconds
+UPSTREAM_CONNECT_TIMEOUT = 3.05
+UPSTREAM_READ_TIMEOUT = 10
+UPSTREAM_RETRIES = 2
+UPSTREAM_BACKOFF = 0.2
+UPSTREAM_POOL_SIZE = 10
+UPSTREAM_BREAKER_FAILURES = 5
+UPSTREAM_BREAKER_RESET = 30
+# Connections the async client (used by core.async_views) may hold open
+UPSTREAM_ASYNC_MAX_CONNECTIONS = 500
+
+# Upstream listings (core.cache) are fresh for UPSTREAM_CACHE_TTL seconds
+# and served stale while refreshing for UPSTREAM_CACHE_STALE more
+UPSTREAM_CACHE_ALIAS = 'default'
+UPSTREAM_CACHE_TTL = 60
+UPSTREAM_CACHE_STALE = 300
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -185,7 +313,8 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
+    "TOKEN_OBTAIN_SERIALIZER":
+        "user.serializers.ClaimsTokenObtainPairSerializer",
     "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
@@ -0,0 +1,128 @@
+"""
+Async versions of the upstream proxy views.
+
+Under ASGI these run on the event loop and share one pooled httpx
+client, so a worker can wait on many upstream calls at once instead of
+blocking a thread per call. Responses match the views in core.views.
+
+The method checks are inline, and post_user is marked csrf_exempt by
+hand, because Django 3.2's decorators wrap views in sync functions,
+which would hide that these are coroutines.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotAllowed, JsonResponse
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import acached_fetch
+from .http import CircuitOpen, UpstreamError, async_client
+from .serializers import UserSerializer
+from .views import (
+    BadGateway, CustomLimitOffsetPagination, UpstreamUnavailable, camera_page,
+)
+
+
+def error_response(exc):
+    detail = exc.detail
+    if not isinstance(detail, dict):
+        detail = {'detail': detail}
+    return JsonResponse(detail, status=exc.status_code, encoder=JSONEncoder)
+
+
+async def fetch_json(method, url, **kwargs):
+    """Async core.views.fetch_json()."""
+    try:
+        response = await async_client.request(method, url, **kwargs)
+        return response.json()
+    except CircuitOpen as exc:
+        raise UpstreamUnavailable() from exc
+    except (UpstreamError, ValueError) as exc:
+        raise BadGateway() from exc
+
+
+async def fetch_users():
+    return await fetch_json('GET', settings.USERS_API_URL)
+
+
+async def cached_page(request, name, afetch, serializer_class):
+    """Async core.views.cached_page()."""
+    try:
+        data, state = await acached_fetch(name, afetch)
+    except (BadGateway, UpstreamUnavailable) as exc:
+        return error_response(exc)
+    paginator = CustomLimitOffsetPagination()
+    paginated_response = paginator.paginate_queryset(data, Request(request))
+    serializer = serializer_class(paginated_response, many=True)
+    response = JsonResponse(
+        paginator.get_paginated_response(serializer.data).data,
+        encoder=JSONEncoder,
+    )
+    response['X-Cache'] = state
+    return response
+
+
+def authenticated_request(request):
+    """Wrap request for DRF and run its authentication (synchronously)."""
+    drf_request = Request(request, authenticators=[
+        auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ])
+    drf_request.user
+    return drf_request
+
+
+async def get_user_data(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    return await cached_page(request, 'users', fetch_users, UserSerializer)
+
+
+async def post_user(request):
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        drf_request = await sync_to_async(authenticated_request)(request)
+    except APIException as exc:
+        return error_response(exc)
+    if not IsAdminUser().has_permission(drf_request, None):
+        status = 401 if drf_request.user.is_anonymous else 403
+        detail = 'You do not have permission to perform this action.'
+        return JsonResponse({'detail': detail}, status=status)
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'detail': 'JSON parse error.'}, status=400)
+
+    try:
+        response_data = await fetch_json(
+            'POST', settings.POSTS_API_URL, json=data,
+        )
+    except (BadGateway, UpstreamUnavailable) as exc:
+        return error_response(exc)
+    serializer = UserSerializer(data=response_data)
+
+    if serializer.is_valid():
+        return JsonResponse(serializer.data, encoder=JSONEncoder)
+    else:
+        return JsonResponse(serializer.errors, status=400)
+
+
+# Authenticated by token like the DRF view, so no CSRF check. This is
+# what csrf_exempt does, but that wrapper would hide the coroutine.
+post_user.csrf_exempt = True
+
+
+async def get_cameras(request):
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    # The camera listing is read from the database snapshot.
+    try:
+        response = await sync_to_async(camera_page)(Request(request))
+    except APIException as exc:
+        return error_response(exc)
+    return JsonResponse(response.data, encoder=JSONEncoder)
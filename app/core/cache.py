@@ -0,0 +1,173 @@
+"""
+Cache for upstream API responses.
+
+Entries are fresh for UPSTREAM_CACHE_TTL seconds. For another
+UPSTREAM_CACHE_STALE seconds a stale entry is still served while one
+background thread refreshes it. Concurrent misses on the same key in a
+process share a single upstream call.
+
+acached_fetch() is the asyncio counterpart for the async views; it
+coalesces and refreshes on the running event loop instead of threads.
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+KEY = 'upstream:{name}'
+
+HIT = 'HIT'
+STALE = 'STALE'
+MISS = 'MISS'
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_refresher = ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix='upstream-refresh',
+)
+
+# Per event loop: {key: asyncio.Task} of running fetches, and the
+# background refresh tasks (held so they aren't garbage collected).
+_ainflight = weakref.WeakKeyDictionary()
+_arefreshing = set()
+
+
+def get_cache():
+    return caches[settings.UPSTREAM_CACHE_ALIAS]
+
+
+def _load(key, fetch):
+    """Fetch and store key, sharing the call with concurrent callers."""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        data = fetch()
+        get_cache().set(
+            key, (time.time(), data),
+            settings.UPSTREAM_CACHE_TTL + settings.UPSTREAM_CACHE_STALE,
+        )
+        future.set_result(data)
+    except BaseException as exc:
+        # Even SystemExit or KeyboardInterrupt must reach the waiters.
+        future.set_exception(exc)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+    return data
+
+
+def _refresh(key, fetch):
+    try:
+        _load(key, fetch)
+    except Exception:
+        logger.warning(
+            'Refreshing %s failed; serving the stale copy', key, exc_info=True,
+        )
+
+
+def cached_fetch(name, fetch):
+    """Return (data, state) for name, calling fetch() when needed.
+
+    state is HIT for a fresh entry, STALE when the entry is being
+    refreshed in the background and MISS when fetch() ran for this call.
+    """
+    key = KEY.format(name=name)
+    entry = get_cache().get(key)
+    if entry is None:
+        return _load(key, fetch), MISS
+
+    fetched_at, data = entry
+    if time.time() - fetched_at < settings.UPSTREAM_CACHE_TTL:
+        return data, HIT
+    with _inflight_lock:
+        refreshing = key in _inflight
+    if not refreshing:
+        _refresher.submit(_refresh, key, fetch)
+    return data, STALE
+
+
+async def _cache_call(method, *args):
+    # Cache backends are synchronous; keep them off the event loop without
+    # funnelling every call through the one thread-sensitive executor.
+    call = sync_to_async(getattr(get_cache(), method), thread_sensitive=False)
+    return await call(*args)
+
+
+async def _afetch_and_store(key, afetch, inflight):
+    try:
+        data = await afetch()
+        await _cache_call(
+            'set', key, (time.time(), data),
+            settings.UPSTREAM_CACHE_TTL + settings.UPSTREAM_CACHE_STALE,
+        )
+        return data
+    finally:
+        del inflight[key]
+
+
+def _retrieve_exception(task):
+    # Don't warn about an exception nobody else was waiting for.
+    if not task.cancelled():
+        task.exception()
+
+
+async def _aload(key, afetch):
+    """Fetch and store key, sharing the call with concurrent callers.
+
+    The fetch runs in its own task and every caller awaits it shielded,
+    so a caller that is cancelled (e.g. its client went away) doesn't
+    cancel the load for the others.
+    """
+    loop = asyncio.get_running_loop()
+    inflight = _ainflight.setdefault(loop, {})
+    task = inflight.get(key)
+    if task is None:
+        task = loop.create_task(_afetch_and_store(key, afetch, inflight))
+        inflight[key] = task
+        task.add_done_callback(_retrieve_exception)
+    return await asyncio.shield(task)
+
+
+async def _arefresh(key, afetch):
+    try:
+        await _aload(key, afetch)
+    except Exception:
+        logger.warning(
+            'Refreshing %s failed; serving the stale copy', key, exc_info=True,
+        )
+
+
+async def acached_fetch(name, afetch):
+    """Async cached_fetch(): afetch is a coroutine function."""
+    key = KEY.format(name=name)
+    entry = await _cache_call('get', key)
+    if entry is None:
+        return await _aload(key, afetch), MISS
+
+    fetched_at, data = entry
+    if time.time() - fetched_at < settings.UPSTREAM_CACHE_TTL:
+        return data, HIT
+    if key not in _ainflight.get(asyncio.get_running_loop(), {}):
+        task = asyncio.get_running_loop().create_task(_arefresh(key, afetch))
+        _arefreshing.add(task)
+        task.add_done_callback(_arefreshing.discard)
+    return data, STALE
+
+
+def invalidate(name):
+    get_cache().delete(KEY.format(name=name))
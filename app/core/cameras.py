@@ -0,0 +1,395 @@
+"""
+Local snapshot of the camera listing.
+
+refresh_sources() fetches every source in CAMERA_SOURCES concurrently,
+and refresh_snapshot() renders each camera list once and writes only
+what changed since the previous fetch; the camera views then page and
+filter the stored payloads in the database.
+
+The views serve the stored snapshot and, once a source wasn't fetched
+for CAMERA_REFRESH_INTERVAL seconds, refresh it on a background thread.
+Of the workers noticing that at once, only the one winning
+claim_refresh() fetches.
+"""
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from core.http import UpstreamError, client
+from core.models import Camera, CameraSource
+from core.serializers import CameraSerializer
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+BOOLEAN_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+# Serializes the refreshes of this process.
+_refresh_lock = threading.Lock()
+# Held while a background refresh is queued or running.
+_refreshing = threading.Lock()
+_refresher = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix='camera-refresh',
+)
+
+
+def payload_hash(payload):
+    data = json.dumps(
+        payload, sort_keys=True, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def groups_key(groups):
+    if not groups:
+        return ''
+    sep = Camera.GROUP_SEPARATOR
+    return sep + sep.join(str(group) for group in groups) + sep
+
+
+def stream_access_point(item):
+    """Return the accessPoint of item's first video stream, or ''."""
+    streams = item.get('videoStreams')
+    if (not isinstance(streams, list) or not streams
+            or not isinstance(streams[0], dict)):
+        return ''
+    return str(streams[0].get('accessPoint') or '')
+
+
+def to_camera(payload, source, access_point=''):
+    return Camera(
+        display_id=payload['displayId'],
+        source=source,
+        vendor=payload['vendor'],
+        enabled=payload['enabled'],
+        is_activated=payload['isActivated'],
+        groups_key=groups_key(payload['groups']),
+        payload=payload,
+        payload_hash=payload_hash([payload, access_point]),
+        stream_access_point=access_point,
+    )
+
+
+def refresh_snapshot(cameras, source='default'):
+    """Make the stored cameras of source match cameras.
+
+    Each camera is rendered through CameraSerializer here, once, and
+    stored as rendered, so listing needs no serializer. Cameras that
+    can't be rendered are skipped. Returns the number of created,
+    updated, deleted, unchanged and invalid cameras.
+    """
+    counts = dict.fromkeys(
+        ('created', 'updated', 'deleted', 'unchanged', 'invalid'), 0,
+    )
+    fetched = {}
+    for item in cameras:
+        try:
+            camera = to_camera(
+                dict(CameraSerializer(item).data), source,
+                stream_access_point(item),
+            )
+        except (AttributeError, KeyError, TypeError, ValueError):
+            counts['invalid'] += 1
+            continue
+        fetched[camera.display_id] = camera
+
+    with transaction.atomic():
+        # One read covers this source's cameras and fetched cameras that
+        # are stored under another source (they move here).
+        stored = {}
+        ids = {}
+        rows = Camera.objects.filter(
+            Q(source=source) | Q(display_id__in=list(fetched))
+        ).values_list('display_id', 'id', 'source', 'payload_hash')
+        for display_id, camera_id, camera_source, hash_ in rows:
+            ids[display_id] = camera_id
+            if camera_source == source:
+                stored[display_id] = hash_
+        created = [camera for key, camera in fetched.items() if key not in ids]
+        changed = []
+        for key, camera in fetched.items():
+            if key not in ids:
+                continue
+            if stored.get(key) == camera.payload_hash:
+                counts['unchanged'] += 1
+                continue
+            camera.id = ids[key]
+            camera.updated_at = timezone.now()
+            changed.append(camera)
+
+        stale = set(stored) - set(fetched)
+        if stale:
+            counts['deleted'], _ = Camera.objects.filter(
+                source=source, display_id__in=list(stale),
+            ).delete()
+        # Another process refreshing at the same time may have inserted
+        # the same cameras; theirs are as current as ours.
+        Camera.objects.bulk_create(
+            created, batch_size=BATCH_SIZE, ignore_conflicts=True,
+        )
+        Camera.objects.bulk_update(
+            changed,
+            ['source', 'vendor', 'enabled', 'is_activated', 'groups_key',
+             'payload', 'payload_hash', 'stream_access_point', 'updated_at'],
+            batch_size=BATCH_SIZE,
+        )
+    counts['created'] = len(created)
+    counts['updated'] = len(changed)
+    return counts
+
+
+def fetch_source(source):
+    """Return the camera list of one CAMERA_SOURCES entry."""
+    response = client.get(
+        f"{source['url']}/camera/list",
+        auth=source.get('auth'),
+        headers={'Content-type': 'Application/json'},
+        timeout=(
+            settings.UPSTREAM_CONNECT_TIMEOUT,
+            source.get('timeout', settings.UPSTREAM_READ_TIMEOUT),
+        ),
+    )
+    return response.json().get('cameras', [])
+
+
+def _fetch_or_error(source):
+    try:
+        return fetch_source(source), None
+    except (UpstreamError, ValueError, AttributeError) as exc:
+        return None, str(exc) or type(exc).__name__
+
+
+def fetch_sources(sources):
+    """Fetch all sources at once; returns ({name: cameras}, {name: error}).
+
+    Each source is bounded by its own timeout, so this takes as long as
+    the slowest source rather than the sum of all of them.
+    """
+    fetched = {}
+    errors = {}
+    if not sources:
+        return fetched, errors
+    workers = min(settings.CAMERA_FANOUT_WORKERS, len(sources))
+    with ThreadPoolExecutor(max_workers=workers,
+                            thread_name_prefix='camera-fetch') as pool:
+        results = pool.map(_fetch_or_error, sources)
+        for source, (cameras, error) in zip(sources, results):
+            if error is None:
+                fetched[source['name']] = cameras
+            else:
+                errors[source['name']] = error
+    return fetched, errors
+
+
+def merge_sources(fetched, sources):
+    """Drop cameras already listed by an earlier source in sources.
+
+    The same camera can be reachable through several hosts; it is kept
+    under the first source listing it.
+    """
+    seen = set()
+    merged = {}
+    for source in sources:
+        cameras = fetched.get(source['name'])
+        if cameras is None:
+            continue
+        merged[source['name']] = []
+        for item in cameras:
+            display_id = None
+            if isinstance(item, dict):
+                display_id = item.get('displayId')
+            if display_id is not None:
+                if display_id in seen:
+                    continue
+                seen.add(display_id)
+            merged[source['name']].append(item)
+    return merged
+
+
+def refresh_sources(sources=None):
+    """Refresh the snapshot from every camera source.
+
+    Sources that fail keep their stored cameras. Each source's outcome
+    is stored in CameraSource, where source_status() reads it from any
+    process. Returns ({name: counts}, [{'source': name, 'detail': error}]).
+    """
+    with _refresh_lock:
+        return _refresh_sources(
+            settings.CAMERA_SOURCES if sources is None else sources,
+        )
+
+
+def _refresh_sources(sources):
+    fetched, errors = fetch_sources(sources)
+    counts = {
+        name: refresh_snapshot(cameras, source=name)
+        for name, cameras in merge_sources(fetched, sources).items()
+    }
+    now = timezone.now()
+    for source in sources:
+        CameraSource.objects.update_or_create(
+            name=source['name'],
+            defaults={
+                'fetched_at': now, 'error': errors.get(source['name'], ''),
+            },
+        )
+    errors = [
+        {'source': name, 'detail': detail} for name, detail in errors.items()
+    ]
+    return counts, errors
+
+
+def fill_snapshot():
+    """Fetch the snapshot while it is empty, if this caller wins the claim.
+
+    Returns None when another caller fills it: callers in this process
+    wait for that fetch, those in other processes lose claim_refresh().
+    A fill that found nothing isn't retried for CAMERA_REFRESH_INTERVAL.
+    """
+    with _refresh_lock:
+        if Camera.objects.exists() or not claim_refresh():
+            return None
+        return _refresh_sources(settings.CAMERA_SOURCES)
+
+
+def source_status():
+    """Return (errors, stale) of the configured sources in one query.
+
+    errors lists the sources whose latest fetch failed; stale is true
+    when one wasn't fetched within CAMERA_REFRESH_INTERVAL seconds.
+    """
+    names = [source['name'] for source in settings.CAMERA_SOURCES]
+    rows = {
+        name: (fetched_at, error)
+        for name, fetched_at, error in CameraSource.objects
+        .filter(name__in=names).values_list('name', 'fetched_at', 'error')
+    }
+    interval = timedelta(seconds=settings.CAMERA_REFRESH_INTERVAL)
+    since = timezone.now() - interval
+    errors = [
+        {'source': name, 'detail': rows[name][1]}
+        for name in names if name in rows and rows[name][1]
+    ]
+    stale = any(
+        name not in rows or rows[name][0] is None or rows[name][0] < since
+        for name in names
+    )
+    return errors, stale
+
+
+def claim_refresh():
+    """Claim the refresh of stale sources for this process.
+
+    The claim stamps fetched_at with one conditional UPDATE, so of the
+    workers claiming at once only one gets the stale rows.
+    """
+    now = timezone.now()
+    since = now - timedelta(seconds=settings.CAMERA_REFRESH_INTERVAL)
+    names = [source['name'] for source in settings.CAMERA_SOURCES]
+    CameraSource.objects.bulk_create(
+        [CameraSource(name=name) for name in names], ignore_conflicts=True,
+    )
+    return bool(
+        CameraSource.objects.filter(name__in=names)
+        .filter(Q(fetched_at__isnull=True) | Q(fetched_at__lt=since))
+        .update(fetched_at=now)
+    )
+
+
+def refresh_in_background():
+    """Queue a refresh of the stale snapshot, False if one is queued."""
+    if not _refreshing.acquire(blocking=False):
+        return False
+    try:
+        _refresher.submit(_refresh_claimed)
+    except BaseException:
+        _refreshing.release()
+        raise
+    return True
+
+
+def _refresh_claimed():
+    try:
+        if claim_refresh():
+            refresh_sources()
+    except Exception:
+        logger.warning('Refreshing the camera snapshot failed', exc_info=True)
+    finally:
+        _refreshing.release()
+        # This thread outlives any request; don't leave its connection open.
+        connection.close()
+
+
+def get_source(name):
+    """Return the CAMERA_SOURCES entry called name, or None."""
+    for source in settings.CAMERA_SOURCES:
+        if source['name'] == name:
+            return source
+    return None
+
+
+def open_snapshot(camera, source):
+    """Start streaming camera's current JPEG from its source.
+
+    Snapshots are taken from the camera's first video stream. The
+    credentials stay on the server; clients only see the proxy URL.
+    """
+    return client.get(
+        f"{source['url']}/live/media/snapshot/{camera.stream_access_point}",
+        auth=source.get('auth'),
+        timeout=(
+            settings.UPSTREAM_CONNECT_TIMEOUT,
+            source.get('timeout', settings.UPSTREAM_READ_TIMEOUT),
+        ),
+        stream=True,
+    )
+
+
+def iter_snapshot(response, chunk_size):
+    """Yield the body of an open_snapshot() response, then release it."""
+    try:
+        yield from response.iter_content(chunk_size)
+    finally:
+        response.close()
+
+
+def _param_to_bool(name, value):
+    try:
+        return BOOLEAN_VALUES[value.lower()]
+    except KeyError:
+        raise ValidationError({name: ['Expected true or false.']})
+
+
+def filter_cameras(queryset, params):
+    """Apply the vendor, enabled, isActivated and groups query params.
+
+    groups takes a comma separated list and matches cameras in any of
+    the groups.
+    """
+    vendor = params.get('vendor')
+    if vendor:
+        queryset = queryset.filter(vendor=vendor)
+    enabled = params.get('enabled')
+    if enabled:
+        queryset = queryset.filter(enabled=_param_to_bool('enabled', enabled))
+    is_activated = params.get('isActivated')
+    if is_activated:
+        queryset = queryset.filter(
+            is_activated=_param_to_bool('isActivated', is_activated),
+        )
+    groups = [group for group in params.get('groups', '').split(',') if group]
+    if groups:
+        match = Q()
+        for group in groups:
+            match |= Q(groups_key__contains=groups_key([group]))
+        queryset = queryset.filter(match)
+    return queryset
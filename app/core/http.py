@@ -0,0 +1,265 @@
+"""
+Shared HTTP client for upstream APIs.
+
+Each upstream host gets one requests.Session whose connections are kept
+alive and reused, plus a circuit breaker. Every call is bounded by
+connect/read timeouts and a small number of retries with backoff, and a
+host that keeps failing is skipped until its breaker's cool-down ends.
+
+AsyncHTTPClient does the same for the async views on top of httpx.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+
+class UpstreamError(Exception):
+    """An upstream call failed or answered with a server error."""
+
+
+class CircuitOpen(UpstreamError):
+    """The upstream host failed too often and is not being called."""
+
+
+class CircuitBreaker:
+    """Count consecutive failures and stop calls once there are too many.
+
+    After failure_threshold failures the circuit opens for reset_timeout
+    seconds. Then a single trial call is let through: success closes the
+    circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            elapsed = time.monotonic() - self.opened_at
+            if self._trial or elapsed < self.reset_timeout:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+    def record_aborted(self):
+        """End a call cut short on our side, e.g. cancelled or interrupted.
+
+        It counts neither way, but a trial call ending so lets the next
+        call be tried instead of keeping the circuit open for good.
+        """
+        with self._lock:
+            self._trial = False
+
+
+class HTTPClient:
+    """Pooled, timeout-bounded requests with a circuit breaker per host"""
+
+    def __init__(self, connect_timeout, read_timeout, retries, backoff,
+                 pool_size, failure_threshold, reset_timeout):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        with self._lock:
+            if key not in self._hosts:
+                self._hosts[key] = (self._session(), CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout,
+                ))
+            return self._hosts[key]
+
+    def _session(self):
+        # Only idempotent methods are retried, and only on connection
+        # errors and gateway-type statuses.
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size,
+            max_retries=retry, pool_block=False,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def request(self, method, url, **kwargs):
+        """Send a request, raising UpstreamError instead of hanging or 5xx."""
+        session, breaker = self._host(url)
+        if not breaker.allow():
+            raise CircuitOpen(f'{urlsplit(url).netloc} is unavailable')
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.RequestException as exc:
+                raise UpstreamError(str(exc)) from exc
+            if response.status_code >= 500:
+                raise UpstreamError(f'{url} answered {response.status_code}')
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.record_aborted()
+            raise
+        breaker.record_success()
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        with self._lock:
+            for session, _ in self._hosts.values():
+                session.close()
+            self._hosts.clear()
+
+
+class AsyncHTTPClient:
+    """httpx-based HTTPClient for async views.
+
+    An httpx.AsyncClient is tied to the event loop it runs on, so one is
+    kept per loop; under ASGI that is a single client pooling up to
+    max_connections connections across hosts. httpx only retries failed
+    connects, not error statuses.
+    """
+
+    def __init__(self, connect_timeout, read_timeout, retries,
+                 max_connections, failure_threshold, reset_timeout):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.max_connections = max_connections
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        # Overrides the pooled transport, e.g. with an httpx.MockTransport.
+        self.transport = None
+        self._clients = weakref.WeakKeyDictionary()
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def _client(self):
+        if httpx is None:
+            raise ImproperlyConfigured(
+                'The async upstream views require httpx.',
+            )
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            transport = self.transport or httpx.AsyncHTTPTransport(
+                retries=self.retries,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+            client = self._clients[loop] = httpx.AsyncClient(
+                transport=transport,
+                timeout=httpx.Timeout(
+                    self.read_timeout, connect=self.connect_timeout,
+                ),
+            )
+        return client
+
+    def _breaker(self, url):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(
+                    self.failure_threshold, self.reset_timeout,
+                )
+            return self._breakers[key]
+
+    async def request(self, method, url, **kwargs):
+        """Send a request, raising UpstreamError instead of hanging or 5xx."""
+        breaker = self._breaker(url)
+        if not breaker.allow():
+            raise CircuitOpen(f'{urlsplit(url).netloc} is unavailable')
+        try:
+            try:
+                response = await self._client().request(method, url, **kwargs)
+            except httpx.HTTPError as exc:
+                # Some httpx errors carry no message.
+                raise UpstreamError(f'{url}: {exc!r}') from exc
+            if response.status_code >= 500:
+                raise UpstreamError(f'{url} answered {response.status_code}')
+        except Exception:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # e.g. the request's task was cancelled
+            breaker.record_aborted()
+            raise
+        breaker.record_success()
+        return response
+
+    async def aclose(self):
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+client = HTTPClient(
+    connect_timeout=settings.UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=settings.UPSTREAM_READ_TIMEOUT,
+    retries=settings.UPSTREAM_RETRIES,
+    backoff=settings.UPSTREAM_BACKOFF,
+    pool_size=settings.UPSTREAM_POOL_SIZE,
+    failure_threshold=settings.UPSTREAM_BREAKER_FAILURES,
+    reset_timeout=settings.UPSTREAM_BREAKER_RESET,
+)
+
+async_client = AsyncHTTPClient(
+    connect_timeout=settings.UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=settings.UPSTREAM_READ_TIMEOUT,
+    retries=settings.UPSTREAM_RETRIES,
+    max_connections=settings.UPSTREAM_ASYNC_MAX_CONNECTIONS,
+    failure_threshold=settings.UPSTREAM_BREAKER_FAILURES,
+    reset_timeout=settings.UPSTREAM_BREAKER_RESET,
+)
@@ -0,0 +1,38 @@
+"""
+Django command to refresh the local camera snapshot.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cameras import refresh_sources
+
+
+class Command(BaseCommand):
+    """Fetch every camera source and store what changed since last time."""
+    help = 'Refresh the camera snapshot served by /api/cameras/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep refreshing every INTERVAL seconds instead of once.',
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            counts, errors = refresh_sources()
+            for name, source_counts in counts.items():
+                self.stdout.write(self.style.SUCCESS(f'{name}: ' + ', '.join(
+                    f'{count} {kind}' for kind, count in source_counts.items()
+                )))
+            for error in errors:
+                self.stderr.write(
+                    f"{error['source']}: fetching cameras failed: "
+                    f"{error['detail']}"
+                )
+            if not interval:
+                if errors and not counts:
+                    raise CommandError('Every camera source failed.')
+                return
+            time.sleep(interval)
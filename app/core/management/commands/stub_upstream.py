@@ -0,0 +1,168 @@
+"""
+Django command to run a local stand-in for the upstream APIs.
+"""
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+def fake_user(pk):
+    return {
+        'id': pk,
+        'name': f'User {pk}',
+        'username': f'user{pk}',
+        'email': f'user{pk}@example.com',
+        'address': {
+            'street': 'Demo street',
+            'suite': 'Demo suite',
+            'city': 'Unknown city',
+            'zipcode': 'xxxx-1234',
+            'geo': {'lat': '0', 'lng': '0'},
+        },
+        'phone': 'demo-phone',
+        'website': 'demo-website',
+        'company': {
+            'name': 'Demo company', 'catchPhrase': 'test phrase',
+            'bs': 'test bs',
+        },
+    }
+
+
+def fake_camera(pk):
+    return {
+        'accessPoint': f'hosts/STUB/DeviceIpint.{pk}',
+        'archives': [],
+        'audioStreams': '',
+        'azimuth': '0',
+        'camera_access': 'CAMERA_ACCESS_FULL',
+        'comment': '',
+        'detectors': [],
+        'displayId': str(pk),
+        'displayName': f'Camera {pk}',
+        'enabled': True,
+        'groups': [],
+        'ipAddress': f'10.0.0.{pk % 255}',
+        'isActivated': True,
+        'latitude': False,
+        'longitude': '0',
+        'model': 'Stub',
+        'offlineDetectors': '',
+        'panomorph': False,
+        'ptzs': [],
+        'rays': [],
+        'textSources': [],
+        'vendor': 'Stub',
+        'videoStreams': [
+            {'accessPoint':
+                f'hosts/STUB/DeviceIpint.{pk}/SourceEndpoint.video:0:0'},
+        ],
+    }
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections under load tests.
+    request_queue_size = 1024
+
+
+def make_server(host, port, delay=0, users=10, cameras=20):
+    """Build a threaded HTTP server answering like the upstream APIs.
+
+    GET /users, POST /posts, GET /camera/list and GET
+    /live/media/snapshot/<accessPoint> are served, each after sleeping
+    delay seconds to mimic a slow upstream.
+    """
+    routes = {
+        ('GET', '/users'): [fake_user(pk) for pk in range(1, users + 1)],
+        ('GET', '/camera/list'): {
+            'cameras': [fake_camera(pk) for pk in range(1, cameras + 1)],
+        },
+    }
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            # Like the camera server, snapshots come from a video stream.
+            if (path.startswith('/live/media/snapshot/')
+                    and '/SourceEndpoint.video:' in path):
+                return self.respond_jpeg(path)
+            self.respond(routes.get(('GET', path)))
+
+        def respond_jpeg(self, path):
+            if delay:
+                time.sleep(delay)
+            # Not a decodable image, just JPEG markers around some bytes.
+            payload = b'\xff\xd8' + path.encode() * 64 + b'\xff\xd9'
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            body = self.rfile.read(
+                int(self.headers.get('Content-Length') or 0),
+            )
+            if self.path.split('?')[0] != '/posts':
+                return self.respond(None)
+            try:
+                data = json.loads(body or b'{}')
+            except ValueError:
+                data = {}
+            self.respond({**fake_user(101), **data, 'id': 101}, status=201)
+
+        def respond(self, data, status=200):
+            if delay:
+                time.sleep(delay)
+            if data is None:
+                data, status = {'detail': 'Not found.'}, 404
+            payload = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubServer((host, port), Handler)
+
+
+class Command(BaseCommand):
+    """Serve fake users and cameras for load-testing the proxy views."""
+    help = 'Run a stub of the user/post/camera upstream APIs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument(
+            '--delay', type=float, default=0,
+            help='Seconds to wait before each response.',
+        )
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--cameras', type=int, default=20)
+
+    def handle(self, *args, **options):
+        server = make_server(
+            options['host'], options['port'], options['delay'],
+            options['users'], options['cameras'],
+        )
+        base = f"http://{options['host']}:{server.server_address[1]}"
+        self.stdout.write(
+            self.style.SUCCESS(f'Stub upstream listening on {base}'),
+        )
+        self.stdout.write(
+            f'Point the app at it with USERS_API_URL={base}/users '
+            f'POSTS_API_URL={base}/posts CAMERA_API_URL={base}'
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
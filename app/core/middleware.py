@@ -0,0 +1,160 @@
+"""
+Response compression negotiated through Accept-Encoding.
+
+Text and JSON responses of at least COMPRESSION_MIN_SIZE bytes are sent
+with brotli when the client accepts it and the brotli package is
+installed, else with gzip. Streaming responses are compressed as they
+are sent.
+
+A view can set response.compression_cache = (cache, key, timeout) for a
+response rendered from cached data; the compressed bodies are then kept
+in that cache under key, so repeated hits aren't compressed again.
+"""
+import gzip
+import hashlib
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP = 'gzip'
+BROTLI = 'br'
+VARIANT_KEY = '{key}:{coding}'
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/xml',
+)
+
+
+def parse_accept_encoding(header):
+    """Return {coding: q} of an Accept-Encoding header."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate(header):
+    """Return the coding to answer a request with, or None for identity.
+
+    Brotli wins over gzip unless the client prefers gzip by q-value. A
+    wildcard only stands for gzip: brotli goes to clients naming it.
+    """
+    accepted = parse_accept_encoding(header)
+    codings = (BROTLI, GZIP) if brotli is not None else (GZIP,)
+    best, best_q = None, 0
+    for coding in codings:
+        q = accepted.get(coding, accepted.get('*', 0) if coding == GZIP else 0)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(content, coding):
+    if coding == BROTLI:
+        return brotli.compress(
+            content, quality=settings.COMPRESSION_BROTLI_QUALITY,
+        )
+    # A fixed mtime keeps equal bodies byte-identical.
+    return gzip.compress(
+        content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0,
+    )
+
+
+def compress_stream(chunks, coding):
+    """Compress an iterable of byte chunks, yielding the compressed data."""
+    if coding == BROTLI:
+        compressor = brotli.Compressor(
+            quality=settings.COMPRESSION_BROTLI_QUALITY,
+        )
+        add, finish = compressor.process, compressor.finish
+    else:
+        # wbits=31 writes a gzip header and trailer.
+        compressor = zlib.compressobj(
+            settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31,
+        )
+        add, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = add(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def cached_compress(content, coding, cache, key, timeout):
+    """compress() through cache, keyed by key and checked against content."""
+    key = VARIANT_KEY.format(key=key, coding=coding)
+    digest = hashlib.sha256(content).hexdigest()
+    entry = cache.get(key)
+    if entry is not None and entry[0] == digest:
+        return entry[1]
+    compressed = compress(content, coding)
+    cache.set(key, (digest, compressed), timeout)
+    return compressed
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compress responses with the best coding the client accepts"""
+
+    def compressible(self, response):
+        content_type = response.get('Content-Type', '').lower()
+        return (
+            not response.has_header('Content-Encoding')
+            and content_type.startswith(COMPRESSIBLE_TYPES)
+            and (response.streaming
+                 or len(response.content) >= settings.COMPRESSION_MIN_SIZE)
+        )
+
+    def process_response(self, request, response):
+        if not self.compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, coding,
+            )
+            del response['Content-Length']
+        else:
+            cache_args = getattr(response, 'compression_cache', None)
+            if cache_args is None:
+                compressed = compress(response.content, coding)
+            else:
+                compressed = cached_compress(
+                    response.content, coding, *cache_args,
+                )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The compressed body is no longer byte-equal to the original.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:08
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tags(apps, schema_editor):
+    """Fold tags sharing a user and name into the oldest one."""
+    Tag = apps.get_model('core', 'Tag')
+    Recipe = apps.get_model('core', 'Recipe')
+    through = Recipe.tags.through
+    duplicates = (
+        Tag.objects.values('user_id', 'name')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        keep_id = group['keep_id']
+        extra_ids = list(
+            Tag.objects.filter(user_id=group['user_id'], name=group['name'])
+            .exclude(id=keep_id)
+            .values_list('id', flat=True)
+        )
+        linked = set(
+            through.objects.filter(tag_id=keep_id).values_list('recipe_id', flat=True)
+        )
+        recipe_ids = set(
+            through.objects.filter(tag_id__in=extra_ids).values_list('recipe_id', flat=True)
+        )
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, tag_id=keep_id)
+            for recipe_id in recipe_ids - linked
+        ])
+        Tag.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tags, migrations.RunPython.noop),
+    ]
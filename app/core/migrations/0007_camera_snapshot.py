@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Camera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('display_id', models.CharField(max_length=255, unique=True)),
+                ('source', models.CharField(default='default', max_length=255)),
+                ('vendor', models.CharField(blank=True, max_length=255)),
+                ('enabled', models.BooleanField(default=True)),
+                ('is_activated', models.BooleanField(default=True)),
+                ('groups_key', models.TextField(blank=True)),
+                ('payload', models.JSONField()),
+                ('payload_hash', models.CharField(max_length=64)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='camera',
+            index=models.Index(fields=['vendor', 'display_id'], name='camera_vendor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='camera',
+            index=models.Index(fields=['enabled', 'is_activated', 'display_id'], name='camera_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='camera',
+            index=models.Index(fields=['source'], name='camera_source_idx'),
+        ),
+    ]
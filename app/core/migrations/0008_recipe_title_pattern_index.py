@@ -0,0 +1,31 @@
+from django.db import migrations
+
+INDEX = 'recipe_user_title_like_idx'
+
+
+def create_index(apps, schema_editor):
+    # Only PostgreSQL needs a separate index for LIKE 'prefix%' under
+    # non-C collations.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('core', 'Recipe')._meta.db_table
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX} ON {table} (user_id, title text_pattern_ops)'
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_camera_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_title_pattern_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+                ('modified_at', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_cache_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedUser',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('revoked_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='revokeduser',
+            index=models.Index(fields=['revoked_at'], name='revoked_user_at_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_camera_source'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='stream_access_point',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
@@ -49,6 +49,24 @@ class Recipe(models.Model):
     price = models.DecimalField(blank=True, max_digits=5, decimal_places=2, null=True)
     link = models.CharField(blank=True, null=True, max_length=255)
     tags = models.ManyToManyField('Tag')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            models.Index(
+                fields=['user', 'time_minutes'], name='recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'price'], name='recipe_user_price_idx',
+            ),
+            models.Index(
+                fields=['user', 'title'], name='recipe_user_title_idx',
+            ),
+            models.Index(
+                fields=['user', 'updated_at'], name='recipe_user_updated_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -60,6 +78,126 @@ class Tag(models.Model):
         settings.AUTH_USER_MODEL,
         on_delete = models.CASCADE
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_name_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-name', 'id'], name='tag_user_name_idx',
+            ),
+            models.Index(
+                fields=['user', 'updated_at'], name='tag_user_updated_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class Tombstone(models.Model):
+    """Record of a deleted recipe or tag, kept for incremental sync."""
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    KIND_CHOICES = [
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+    ]
+
+    # A plain id rather than a foreign key: tombstones are written while
+    # a user's recipes are being cascade-deleted along with the user.
+    user_id = models.BigIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user_id', 'deleted_at'],
+                name='tombstone_user_deleted_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class RevokedUser(models.Model):
+    """User whose stateless JWTs are refused, e.g. after deactivation."""
+    # A plain id so the revocation outlives a deleted user.
+    user_id = models.BigIntegerField(primary_key=True)
+    revoked_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['revoked_at'], name='revoked_user_at_idx'),
+        ]
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class CacheVersion(models.Model):
+    """Version of a user's recipes and tags, bumped on every write.
+
+    Kept in the database so every worker sees the same validators.
+    """
+    # A plain id for the same reason as Tombstone.user_id.
+    user_id = models.BigIntegerField(primary_key=True)
+    version = models.BigIntegerField()
+    modified_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f'{self.user_id} v{self.version}'
+
+
+class Camera(models.Model):
+    """Local snapshot of a camera listed by the camera API."""
+    GROUP_SEPARATOR = '|'
+
+    display_id = models.CharField(max_length=255, unique=True)
+    source = models.CharField(max_length=255, default='default')
+    vendor = models.CharField(max_length=255, blank=True)
+    enabled = models.BooleanField(default=True)
+    is_activated = models.BooleanField(default=True)
+    # Groups as '|a|b|' so one group matches with a plain substring test.
+    groups_key = models.TextField(blank=True)
+    # The camera as CameraSerializer rendered it when it was fetched.
+    payload = models.JSONField()
+    payload_hash = models.CharField(max_length=64)
+    # accessPoint of the first video stream, which snapshots are taken
+    # from; the payload only keeps videoStreams as a string.
+    stream_access_point = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['vendor', 'display_id'], name='camera_vendor_idx',
+            ),
+            models.Index(
+                fields=['enabled', 'is_activated', 'display_id'],
+                name='camera_state_idx',
+            ),
+            models.Index(fields=['source'], name='camera_source_idx'),
+        ]
+
+    def __str__(self):
+        return self.display_id
+
+
+class CameraSource(models.Model):
+    """Outcome of the latest fetch of one CAMERA_SOURCES entry."""
+    name = models.CharField(max_length=255, unique=True)
+    fetched_at = models.DateTimeField(null=True)
+    # Why the latest fetch failed; empty when it succeeded.
+    error = models.TextField(blank=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
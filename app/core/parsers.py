@@ -0,0 +1,41 @@
+"""JSON parser built on orjson, the counterpart of core.renderers"""
+import codecs
+import io
+import re
+
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from core.renderers import ORJSONRenderer, orjson
+
+# Integer literals orjson may turn into floats (beyond 64 bits); digits
+# inside strings match too, which only costs the slower parse.
+LONG_INTEGER = re.compile(rb'(?<![\d.])\d{19,}')
+
+
+class ORJSONParser(JSONParser):
+    """Drop-in JSONParser using orjson when it is installed.
+
+    orjson only reads UTF-8 and always rejects NaN and Infinity, as
+    JSONParser does with STRICT_JSON; other charsets and non-strict
+    parsing fall back to JSONParser. So do bodies orjson would read
+    differently: integers beyond 64 bits, which it makes floats, and
+    anything it rejects, such as 1e400, which JSONParser reads as inf.
+    Errors therefore read exactly as JSONParser's.
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get(
+            'encoding', settings.DEFAULT_CHARSET,
+        )
+        if (orjson is None or not self.strict
+                or codecs.lookup(encoding).name != 'utf-8'):
+            return super().parse(stream, media_type, parser_context)
+        content = stream.read()
+        if not LONG_INTEGER.search(content):
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(content), media_type, parser_context)
@@ -0,0 +1,74 @@
+"""
+JSON renderer built on orjson.
+
+ORJSONRenderer writes the same bytes as DRF's JSONRenderer for the
+API's data: compact, UTF-8, with U+2028/U+2029 escaped. Dates, times,
+Decimals, lazy translation strings and the other types DRF's encoder
+knows are handed to that encoder, so they come out exactly as before.
+Indented output, data orjson can't encode (e.g. integers over 64 bits)
+and a missing orjson all fall back to DRF's renderer. So does data
+holding NaN or Infinity, which orjson writes as null: DRF's renderer
+raises ValueError for it under STRICT_JSON and writes NaN otherwise.
+"""
+import math
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+if orjson is not None:
+    # Keep datetimes away from orjson's own formatting so DRF's encoder
+    # decides how they look (e.g. 'Z' for UTC).
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    """Encode data as compact UTF-8 JSON bytes like DRF's JSONRenderer."""
+    return orjson.dumps(data, default=_encoder.default, option=OPTIONS)
+
+
+def has_non_finite(data):
+    """Whether data holds a NaN or infinite float or Decimal."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, Decimal):
+            if not value.is_finite():
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value)
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+class ORJSONRenderer(JSONRenderer):
+    """Drop-in JSONRenderer using orjson when it is installed"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (orjson is None or data is None or self.ensure_ascii
+                or not self.compact or indent is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = dumps(data)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # orjson writes non-finite numbers as null, so only output with a
+        # null needs the (slower) look for them.
+        if b'null' in ret and has_non_finite(data):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping as JSONRenderer.
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028')
+        return ret.replace(b'\xe2\x80\xa9', b'\\u2029')
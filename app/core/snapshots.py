@@ -0,0 +1,165 @@
+"""
+On-disk cache of camera snapshots.
+
+Each camera's latest JPEG is kept as one file. A file is fresh for
+CAMERA_SNAPSHOT_TTL seconds after it was fetched (its mtime); its atime
+records the last read and drives LRU eviction once the directory grows
+past CAMERA_SNAPSHOT_MAX_BYTES. Files are written under a temporary name
+and renamed into place, so readers never see a partial image.
+
+Each process tracks the bytes it has seen stored and only scans the
+directory to evict once that total crosses the limit. lock() lets the
+misses of one snapshot in a process wait for a single fetch.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+_evict_lock = threading.Lock()
+# Bytes stored per directory as far as this process knows.
+_sizes = {}
+
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+
+def _lock_key(name, timeout):
+    """Lock name in this process; returns an idempotent release function.
+
+    After timeout seconds the caller goes ahead unlocked and release does
+    nothing. Locks are dropped once nobody holds or waits for them.
+    """
+    with _key_locks_guard:
+        entry = _key_locks.setdefault(name, [threading.Lock(), 0])
+        entry[1] += 1
+    acquired = entry[0].acquire(timeout=timeout)
+    released = False
+
+    def release():
+        nonlocal released
+        with _key_locks_guard:
+            if released:
+                return
+            released = True
+            if acquired:
+                entry[0].release()
+            entry[1] -= 1
+            if not entry[1]:
+                del _key_locks[name]
+
+    if not acquired:
+        release()
+    return release
+
+
+class SnapshotCache:
+    """Size-bounded LRU of snapshot files with a TTL"""
+    suffix = '.jpg'
+
+    def __init__(self, directory, max_bytes, ttl):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+    def path(self, key):
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / f'{name}{self.suffix}'
+
+    def get(self, key):
+        """Return the path of a fresh snapshot for key, or None."""
+        path = self.path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        if now - stat.st_mtime >= self.ttl:
+            return None
+        # Mark the read for the LRU without touching the fetch time.
+        try:
+            os.utime(path, (now, stat.st_mtime))
+        except FileNotFoundError:
+            return None
+        return path
+
+    def lock(self, key, timeout):
+        """Hold key's fetch in this process; see _lock_key()."""
+        return _lock_key(str(self.path(key)), timeout)
+
+    def tee(self, key, chunks):
+        """Yield chunks while writing them to key's file.
+
+        The file is only kept if every chunk was read; a closed or failed
+        stream leaves the cache untouched.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.part')
+        complete = False
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in chunks:
+                    temp.write(chunk)
+                    yield chunk
+                size = temp.tell()
+            path = self.path(key)
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp_path, path)
+            complete = True
+        finally:
+            if not complete:
+                try:
+                    os.unlink(temp_path)
+                except FileNotFoundError:
+                    pass
+        self._stored(size - replaced)
+
+    def _stored(self, delta):
+        with _evict_lock:
+            total = _sizes.get(self.directory)
+            # The first write seen counts what is already there.
+            total = self._scan()[1] if total is None else total + delta
+            if total > self.max_bytes:
+                total = self._evict()
+            _sizes[self.directory] = total
+
+    def _scan(self):
+        files = []
+        total = 0
+        for path in self.directory.glob(f'*{self.suffix}'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_atime, stat.st_size, path))
+            total += stat.st_size
+        return files, total
+
+    def _evict(self):
+        """Delete least recently read files until under max_bytes."""
+        files, total = self._scan()
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+def get_snapshot_cache():
+    return SnapshotCache(
+        settings.CAMERA_SNAPSHOT_DIR,
+        settings.CAMERA_SNAPSHOT_MAX_BYTES,
+        settings.CAMERA_SNAPSHOT_TTL,
+    )
@@ -0,0 +1,144 @@
+"""
+Tests for the async upstream views, run against the stub upstream server.
+"""
+import asyncio
+import threading
+import time
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.cache import get_cache
+from core.http import AsyncHTTPClient
+from core.management.commands.stub_upstream import make_server
+
+USERS_URL = reverse('async_get_user_data')
+CAMERAS_URL = reverse('async_get_cameras')
+CREATE_URL = reverse('async_create_user')
+
+
+class StubUpstreamMixin:
+    """Run the stub upstream server for the test class."""
+    delay = 0
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = make_server(
+            '127.0.0.1', 0, delay=cls.delay, users=5, cameras=12,
+        )
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+
+class AsyncViewTests(StubUpstreamMixin, TestCase):
+    """Test the async proxy views."""
+
+    def setUp(self):
+        get_cache().clear()
+        settings = override_settings(
+            USERS_API_URL=f'{self.base}/users',
+            POSTS_API_URL=f'{self.base}/posts',
+            CAMERA_SOURCES=[{'name': 'stub', 'url': self.base}],
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_get_users(self):
+        res = self.client.get(USERS_URL, {'limit': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['count'], 5)
+        self.assertEqual(len(res.json()['results']), 2)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(USERS_URL)['X-Cache'], 'HIT')
+
+    def test_get_cameras(self):
+        res = self.client.get(CAMERAS_URL, {'limit': 8, 'offset': 8})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['count'], 12)
+        self.assertEqual(
+            [camera['displayId'] for camera in res.json()['results']],
+            ['6', '7', '8', '9'],
+        )
+
+    def test_wrong_method_rejected(self):
+        res = self.client.post(USERS_URL)
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    def test_post_user_requires_admin(self):
+        res = self.client.post(CREATE_URL, {}, content_type='application/json')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_post_user_as_admin(self):
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testpass123',
+        )
+        res = self.client.post(
+            CREATE_URL, {'name': 'Posted'}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}',
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['name'], 'Posted')
+
+    def test_post_user_skips_csrf(self):
+        """Test a token POST isn't refused by the CSRF check"""
+        admin = get_user_model().objects.create_superuser(
+            email='admin@example.com', password='testpass123',
+        )
+        res = Client(enforce_csrf_checks=True).post(
+            CREATE_URL, {'name': 'Posted'}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(admin)}',
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_post_user_invalid_token(self):
+        """Test a bad token gets a 401 like the sync view"""
+        res = self.client.post(
+            CREATE_URL, {}, content_type='application/json',
+            HTTP_AUTHORIZATION='Bearer garbage',
+        )
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.json()['code'], 'token_not_valid')
+
+    @override_settings(USERS_API_URL='http://127.0.0.1:1/users')
+    def test_unreachable_upstream_returns_502(self):
+        res = self.client.get(USERS_URL)
+        self.assertEqual(res.status_code, status.HTTP_502_BAD_GATEWAY)
+
+
+class AsyncHTTPClientTests(StubUpstreamMixin, TestCase):
+    """Test the shared async client runs upstream calls concurrently."""
+    delay = 0.2
+
+    def test_concurrent_requests(self):
+        client = AsyncHTTPClient(
+            connect_timeout=1, read_timeout=5, retries=0,
+            max_connections=100, failure_threshold=5, reset_timeout=30,
+        )
+
+        async def fetch_many():
+            try:
+                return await asyncio.gather(*[
+                    client.request('GET', f'{self.base}/users')
+                    for _ in range(50)
+                ])
+            finally:
+                await client.aclose()
+
+        start = time.monotonic()
+        responses = async_to_sync(fetch_many)()
+        self.assertEqual(
+            {response.status_code for response in responses}, {200},
+        )
+        # 50 sequential calls would take 10 seconds.
+        self.assertLess(time.monotonic() - start, 3)
@@ -0,0 +1,144 @@
+"""
+Tests for the upstream response cache.
+"""
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import HIT, MISS, STALE, acached_fetch, cached_fetch, get_cache
+
+
+class CountingFetch:
+    """Fetch function counting its calls, optionally waiting for a gate."""
+
+    def __init__(self, gate=None):
+        self.calls = 0
+        self.gate = gate
+
+    def __call__(self):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        return [self.calls]
+
+
+@override_settings(UPSTREAM_CACHE_TTL=60, UPSTREAM_CACHE_STALE=300)
+class CachedFetchTests(SimpleTestCase):
+    """Test TTL, stale-while-revalidate and coalescing."""
+
+    def setUp(self):
+        get_cache().clear()
+
+    def test_fresh_entry_served_from_cache(self):
+        fetch = CountingFetch()
+        self.assertEqual(cached_fetch('items', fetch), ([1], MISS))
+        self.assertEqual(cached_fetch('items', fetch), ([1], HIT))
+        self.assertEqual(fetch.calls, 1)
+
+    def test_stale_entry_served_while_refreshing(self):
+        fetch = CountingFetch()
+        cached_fetch('items', fetch)
+        with mock.patch(
+            'core.cache.time.time', return_value=time.time() + 120,
+        ):
+            self.assertEqual(cached_fetch('items', fetch), ([1], STALE))
+        deadline = time.monotonic() + 5
+        while (cached_fetch('items', fetch)[0] != [2]
+               and time.monotonic() < deadline):
+            time.sleep(0.01)
+        self.assertEqual(fetch.calls, 2)
+        self.assertEqual(cached_fetch('items', fetch), ([2], HIT))
+
+    def test_concurrent_misses_share_one_fetch(self):
+        gate = threading.Event()
+        fetch = CountingFetch(gate)
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(cached_fetch('items', fetch)[0]),
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        gate.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(fetch.calls, 1)
+        self.assertEqual(results, [[1]] * 5)
+
+    def test_failed_fetch_not_cached(self):
+        def fail():
+            raise ValueError('down')
+
+        with self.assertRaises(ValueError):
+            cached_fetch('items', fail)
+        self.assertEqual(cached_fetch('items', CountingFetch()), ([1], MISS))
+
+    def test_interrupted_fetch_releases_waiters(self):
+        started, gate = threading.Event(), threading.Event()
+        results = []
+
+        def interrupted():
+            started.set()
+            gate.wait(5)
+            raise SystemExit()
+
+        def wait():
+            try:
+                cached_fetch('items', CountingFetch())
+            except BaseException as exc:
+                results.append(exc)
+
+        owner = threading.Thread(
+            target=lambda: cached_fetch('items', interrupted),
+        )
+        owner.start()
+        started.wait(5)
+        waiter = threading.Thread(target=wait, daemon=True)
+        waiter.start()
+        time.sleep(0.05)
+        gate.set()
+        waiter.join(5)
+        owner.join(5)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(len(results), 1)
+        self.assertIsInstance(results[0], SystemExit)
+
+
+@override_settings(UPSTREAM_CACHE_TTL=60, UPSTREAM_CACHE_STALE=300)
+class AsyncCachedFetchTests(SimpleTestCase):
+    """Test coalescing in acached_fetch()."""
+
+    def setUp(self):
+        get_cache().clear()
+
+    def test_cancelled_owner_keeps_shared_load(self):
+        """Test cancelling the request that started a fetch spares others"""
+        calls = []
+
+        async def afetch():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return [len(calls)]
+
+        async def run():
+            owner = asyncio.ensure_future(acached_fetch('items', afetch))
+            await asyncio.sleep(0.01)
+            waiter = asyncio.ensure_future(acached_fetch('items', afetch))
+            await asyncio.sleep(0.01)
+            owner.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await owner
+            return await waiter
+
+        self.assertEqual(async_to_sync(run)(), ([1], MISS))
+        self.assertEqual(calls, [1])
+        self.assertEqual(
+            async_to_sync(acached_fetch)('items', afetch), ([1], HIT),
+        )
@@ -0,0 +1,359 @@
+"""
+Tests for the camera snapshot and the camera list view.
+"""
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import cameras
+from core.cache import get_cache
+from core.cameras import claim_refresh, refresh_snapshot, refresh_sources
+from core.http import UpstreamError
+from core.management.commands.stub_upstream import fake_camera
+from core.models import Camera, CameraSource
+from core.serializers import CameraSerializer
+
+CAMERAS_URL = reverse('get_cameras')
+SOURCES = [
+    {'name': 'a', 'url': 'http://a.test'},
+    {'name': 'b', 'url': 'http://b.test'},
+]
+
+
+def camera(pk, **params):
+    data = fake_camera(pk)
+    data.update(params)
+    return data
+
+
+class RefreshSnapshotTests(TestCase):
+    """Test the snapshot diffing."""
+
+    def test_initial_refresh_creates(self):
+        counts = refresh_snapshot([camera(1), camera(2)])
+        self.assertEqual(counts['created'], 2)
+        stored = Camera.objects.get(display_id='1')
+        self.assertEqual(stored.payload, CameraSerializer(camera(1)).data)
+
+    def test_stream_access_point_stored(self):
+        """Test the first video stream's accessPoint is kept for snapshots"""
+        refresh_snapshot([camera(1), camera(2, videoStreams=[])])
+        self.assertEqual(
+            Camera.objects.get(display_id='1').stream_access_point,
+            'hosts/STUB/DeviceIpint.1/SourceEndpoint.video:0:0',
+        )
+        self.assertEqual(
+            Camera.objects.get(display_id='2').stream_access_point, '',
+        )
+
+    def test_stream_change_written(self):
+        refresh_snapshot([camera(1)])
+        moved = camera(1, videoStreams=[
+            {'accessPoint': 'hosts/B/SourceEndpoint.video:1:0'},
+        ])
+        self.assertEqual(refresh_snapshot([moved])['updated'], 1)
+        self.assertEqual(
+            Camera.objects.get(display_id='1').stream_access_point,
+            'hosts/B/SourceEndpoint.video:1:0',
+        )
+
+    def test_only_changes_written(self):
+        refresh_snapshot([camera(1), camera(2), camera(3)])
+        counts = refresh_snapshot(
+            [camera(1), camera(2, enabled=False), camera(4)],
+        )
+        self.assertEqual(counts, {
+            'created': 1, 'updated': 1, 'deleted': 1, 'unchanged': 1,
+            'invalid': 0,
+        })
+        self.assertFalse(Camera.objects.get(display_id='2').enabled)
+        self.assertFalse(Camera.objects.filter(display_id='3').exists())
+
+    def test_unchanged_refresh_writes_nothing(self):
+        refresh_snapshot([camera(1), camera(2)])
+        # The savepoint pair and a single read.
+        with self.assertNumQueries(3):
+            counts = refresh_snapshot([camera(1), camera(2)])
+        self.assertEqual(counts['unchanged'], 2)
+
+    def test_invalid_camera_skipped(self):
+        broken = camera(2)
+        del broken['displayId']
+        counts = refresh_snapshot([camera(1), broken])
+        self.assertEqual(counts['invalid'], 1)
+        self.assertEqual(Camera.objects.count(), 1)
+
+    def test_other_sources_kept(self):
+        refresh_snapshot([camera(1)], source='a')
+        refresh_snapshot([camera(2)], source='b')
+        self.assertEqual(Camera.objects.count(), 2)
+
+
+class CameraListTests(TestCase):
+    """Test listing cameras from the snapshot."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        refresh_snapshot([
+            camera(1, vendor='Axis', groups=['lobby']),
+            camera(2, vendor='Axis', enabled=False, groups=['lobby', 'roof']),
+            camera(3, vendor='Bosch', isActivated=False, groups=['roof']),
+        ])
+        CameraSource.objects.create(name='default', fetched_at=timezone.now())
+
+    def ids(self, params=None):
+        res = self.client.get(CAMERAS_URL, params or {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['displayId'] for item in res.data['results']]
+
+    @mock.patch('core.cameras.fetch_source')
+    def test_fresh_snapshot_not_fetched(self, fetch_source):
+        self.ids()
+        fetch_source.assert_not_called()
+
+    def test_list_paginated_in_database(self):
+        with self.assertNumQueries(4):
+            res = self.client.get(CAMERAS_URL, {'limit': 2})
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual(res.data['results'], [
+            CameraSerializer(camera(1, vendor='Axis', groups=['lobby'])).data,
+            CameraSerializer(camera(
+                2, vendor='Axis', enabled=False,
+                groups=['lobby', 'roof'])).data,
+        ])
+
+    def test_filters(self):
+        self.assertEqual(self.ids({'vendor': 'Axis'}), ['1', '2'])
+        self.assertEqual(self.ids({'enabled': 'false'}), ['2'])
+        self.assertEqual(self.ids({'isActivated': 'true'}), ['1', '2'])
+        self.assertEqual(self.ids({'groups': 'roof'}), ['2', '3'])
+        self.assertEqual(
+            self.ids({'groups': 'lobby,roof', 'vendor': 'Bosch'}), ['3'],
+        )
+        self.assertEqual(self.ids({'groups': 'lob'}), [])
+
+    def test_invalid_boolean_rejected(self):
+        res = self.client.get(CAMERAS_URL, {'enabled': 'maybe'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def empty(self):
+        Camera.objects.all().delete()
+        CameraSource.objects.all().delete()
+
+    @mock.patch('core.cameras.fetch_source')
+    def test_empty_snapshot_fetched(self, fetch_source):
+        self.empty()
+        fetch_source.return_value = [camera(7)]
+        self.assertEqual(self.ids(), ['7'])
+        self.assertEqual(fetch_source.call_count, 1)
+        self.ids()
+        self.assertEqual(fetch_source.call_count, 1)
+
+    @mock.patch('core.cameras.fetch_source', side_effect=UpstreamError('down'))
+    def test_empty_snapshot_unreachable(self, fetch_source):
+        self.empty()
+        res = self.client.get(CAMERAS_URL)
+        self.assertEqual(res.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertEqual(
+            res.data['errors'], [{'source': 'default', 'detail': 'down'}],
+        )
+        # Not fetched again until the interval passes.
+        res = self.client.get(CAMERAS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+        self.assertEqual(
+            res.data['errors'], [{'source': 'default', 'detail': 'down'}],
+        )
+        self.assertEqual(fetch_source.call_count, 1)
+
+    @mock.patch('core.cameras.fetch_source')
+    def test_empty_snapshot_claimed_elsewhere(self, fetch_source):
+        """Test only the request claiming an empty snapshot fetches it"""
+        self.empty()
+        # Another worker is filling it.
+        self.assertTrue(claim_refresh())
+        res = self.client.get(CAMERAS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [])
+        fetch_source.assert_not_called()
+
+
+def fake_fetch(listings, delay=0):
+    """fetch_source stand-in answering per source name."""
+    def fetch_source(source):
+        time.sleep(delay)
+        result = listings[source['name']]
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return fetch_source
+
+
+@override_settings(CAMERA_SOURCES=SOURCES)
+class RefreshSourcesTests(TestCase):
+    """Test fetching several camera sources."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+
+    def test_duplicates_kept_under_first_source(self):
+        listings = {'a': [camera(1), camera(2)], 'b': [camera(2), camera(3)]}
+        with mock.patch('core.cameras.fetch_source', fake_fetch(listings)):
+            counts, errors = refresh_sources()
+        self.assertEqual(errors, [])
+        self.assertEqual(counts['b']['created'], 1)
+        self.assertEqual(
+            dict(Camera.objects.values_list('display_id', 'source')),
+            {'1': 'a', '2': 'a', '3': 'b'},
+        )
+
+    def test_sources_fetched_concurrently(self):
+        listings = {'a': [camera(1)], 'b': [camera(2)]}
+        start = time.monotonic()
+        with mock.patch(
+            'core.cameras.fetch_source', fake_fetch(listings, delay=0.3),
+        ):
+            refresh_sources()
+        self.assertLess(time.monotonic() - start, 0.55)
+
+    def test_partial_failure_reported(self):
+        first_listings = {'a': [camera(1)], 'b': [camera(2)]}
+        with mock.patch(
+            'core.cameras.fetch_source', fake_fetch(first_listings),
+        ):
+            refresh_sources()
+        listings = {
+            'a': [camera(1), camera(4)], 'b': UpstreamError('timed out'),
+        }
+        with mock.patch('core.cameras.fetch_source', fake_fetch(listings)):
+            counts, errors = refresh_sources()
+        self.assertEqual(list(counts), ['a'])
+        self.assertEqual(errors, [{'source': 'b', 'detail': 'timed out'}])
+
+        res = self.client.get(CAMERAS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # The failed source keeps its previous cameras.
+        self.assertEqual(
+            [item['displayId'] for item in res.data['results']],
+            ['1', '2', '4'],
+        )
+        self.assertEqual(res.data['errors'], errors)
+
+        # A later success clears the source's error.
+        with mock.patch(
+            'core.cameras.fetch_source', fake_fetch(first_listings),
+        ):
+            refresh_sources()
+        self.assertEqual(self.client.get(CAMERAS_URL).data['errors'], [])
+
+
+@override_settings(CAMERA_SOURCES=SOURCES)
+class RefreshCamerasCommandTests(TestCase):
+    """Test the refresh_cameras command."""
+
+    def test_refresh(self):
+        listings = {'a': [camera(1), camera(2)], 'b': UpstreamError('down')}
+        out = StringIO()
+        err = StringIO()
+        with mock.patch('core.cameras.fetch_source', fake_fetch(listings)):
+            call_command('refresh_cameras', stdout=out, stderr=err)
+        self.assertIn('a: 2 created', out.getvalue())
+        self.assertIn('b: fetching cameras failed: down', err.getvalue())
+        self.assertEqual(Camera.objects.count(), 2)
+
+    def test_errors_reach_web_workers(self):
+        """Test failures of the command's refresh show up in the listing"""
+        listings = {'a': [camera(1)], 'b': UpstreamError('down')}
+        with mock.patch('core.cameras.fetch_source', fake_fetch(listings)):
+            call_command(
+                'refresh_cameras', stdout=StringIO(), stderr=StringIO(),
+            )
+        # The web worker's cache has nothing of the command's process.
+        get_cache().clear()
+        res = APIClient().get(CAMERAS_URL)
+        self.assertEqual(
+            res.data['errors'], [{'source': 'b', 'detail': 'down'}],
+        )
+        self.assertEqual(
+            dict(CameraSource.objects.values_list('name', 'error')),
+            {'a': '', 'b': 'down'},
+        )
+
+
+@override_settings(CAMERA_SOURCES=SOURCES, CAMERA_REFRESH_INTERVAL=60)
+class BackgroundRefreshTests(TransactionTestCase):
+    """Test refreshing a stale snapshot.
+
+    The refresher thread needs committed rows.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        listings = {'a': [camera(1)], 'b': [camera(2)]}
+        with mock.patch('core.cameras.fetch_source', fake_fetch(listings)):
+            refresh_sources()
+
+    def age(self, seconds=120):
+        CameraSource.objects.update(
+            fetched_at=timezone.now() - timedelta(seconds=seconds),
+        )
+
+    def wait_for_refresh(self):
+        deadline = time.monotonic() + 5
+        while cameras._refreshing.locked() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(cameras._refreshing.locked())
+
+    def test_stale_snapshot_served_while_refreshing(self):
+        self.age()
+        calls = []
+        listings = {'a': [camera(1), camera(3)], 'b': [camera(2)]}
+        fetch = fake_fetch(listings, delay=0.2)
+
+        def counting_fetch(source):
+            calls.append(source['name'])
+            return fetch(source)
+
+        with mock.patch('core.cameras.fetch_source', counting_fetch):
+            for _ in range(3):
+                res = self.client.get(CAMERAS_URL)
+                self.assertEqual(
+                    [item['displayId'] for item in res.data['results']],
+                    ['1', '2'],
+                )
+            self.wait_for_refresh()
+        # The three requests shared one refresh.
+        self.assertEqual(sorted(calls), ['a', 'b'])
+        res = self.client.get(CAMERAS_URL)
+        self.assertEqual(
+            [item['displayId'] for item in res.data['results']],
+            ['1', '2', '3'],
+        )
+
+    def test_claim_is_exclusive(self):
+        """Test only one worker claims a stale snapshot"""
+        self.assertFalse(claim_refresh())
+        self.age()
+        self.assertTrue(claim_refresh())
+        self.assertFalse(claim_refresh())
+
+    @mock.patch('core.cameras.claim_refresh', return_value=False)
+    def test_claimed_elsewhere_not_fetched(self, claim):
+        """Test a worker losing the claim serves the snapshot unrefreshed"""
+        self.age()
+        with mock.patch('core.cameras.fetch_source') as fetch_source:
+            res = self.client.get(CAMERAS_URL)
+            self.wait_for_refresh()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        claim.assert_called_once()
+        fetch_source.assert_not_called()
@@ -0,0 +1,153 @@
+"""
+Tests for the upstream HTTP client and the views using it.
+"""
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.cache import get_cache
+from core.http import CircuitBreaker, CircuitOpen, HTTPClient, UpstreamError
+
+USERS_URL = reverse('get_user_data')
+
+
+def make_client(**params):
+    defaults = dict(
+        connect_timeout=1, read_timeout=2, retries=0, backoff=0,
+        pool_size=2, failure_threshold=2, reset_timeout=30,
+    )
+    defaults.update(params)
+    return HTTPClient(**defaults)
+
+
+def fake_response(status_code=200, data=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b'[]' if data is None else data
+    return response
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    """Test the circuit breaker states."""
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+    def test_single_trial_after_reset(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=5, reset_timeout=0)
+        for _ in range(5):
+            breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        breaker.reset_timeout = 30
+        self.assertFalse(breaker.allow())
+
+
+@mock.patch('requests.Session.request')
+class HTTPClientTests(SimpleTestCase):
+    """Test the pooled upstream client."""
+
+    def test_session_reused_per_host(self, request):
+        client = make_client()
+        self.assertIs(
+            client._host('http://a.test/x')[0],
+            client._host('http://a.test/y')[0],
+        )
+        self.assertIsNot(
+            client._host('http://a.test/')[0],
+            client._host('http://b.test/')[0],
+        )
+
+    def test_timeout_applied(self, request):
+        request.return_value = fake_response()
+        make_client().get('http://a.test/')
+        self.assertEqual(request.call_args.kwargs['timeout'], (1, 2))
+
+    def test_server_error_raises(self, request):
+        request.return_value = fake_response(500)
+        with self.assertRaises(UpstreamError):
+            make_client().get('http://a.test/')
+
+    def test_circuit_opens_on_failures(self, request):
+        request.side_effect = requests.ConnectionError('refused')
+        client = make_client()
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                client.get('http://a.test/')
+        with self.assertRaises(CircuitOpen):
+            client.get('http://a.test/')
+        self.assertEqual(request.call_count, 2)
+        request.side_effect = None
+        request.return_value = fake_response()
+        self.assertEqual(client.get('http://b.test/').status_code, 200)
+
+    def test_unexpected_error_counts_as_failure(self, request):
+        request.side_effect = requests.ConnectionError('refused')
+        client = make_client(failure_threshold=1, reset_timeout=0)
+        with self.assertRaises(UpstreamError):
+            client.get('http://a.test/')
+        request.side_effect = ValueError('bad')
+        with self.assertRaises(ValueError):
+            client.get('http://a.test/')
+        self.assertEqual(client._host('http://a.test/')[1].failures, 2)
+        request.side_effect = None
+        request.return_value = fake_response()
+        self.assertEqual(client.get('http://a.test/').status_code, 200)
+
+    def test_interrupted_trial_released(self, request):
+        request.side_effect = requests.ConnectionError('refused')
+        client = make_client(failure_threshold=1, reset_timeout=0)
+        with self.assertRaises(UpstreamError):
+            client.get('http://a.test/')
+        request.side_effect = KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            client.get('http://a.test/')
+        request.side_effect = None
+        request.return_value = fake_response()
+        self.assertEqual(client.get('http://a.test/').status_code, 200)
+
+
+@mock.patch('core.views.client.request')
+class UpstreamViewTests(SimpleTestCase):
+    """Test upstream failures map to gateway errors."""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+
+    def test_upstream_error_returns_502(self, request):
+        request.side_effect = UpstreamError('boom')
+        res = self.client.get(USERS_URL)
+        self.assertEqual(res.status_code, status.HTTP_502_BAD_GATEWAY)
+
+    def test_open_circuit_returns_503(self, request):
+        request.side_effect = CircuitOpen('down')
+        res = self.client.get(USERS_URL)
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_invalid_json_returns_502(self, request):
+        request.return_value = fake_response(data=b'<html>')
+        res = self.client.get(USERS_URL)
+        self.assertEqual(res.status_code, status.HTTP_502_BAD_GATEWAY)
+
+    def test_success_paginated(self, request):
+        request.return_value = fake_response(data=b'[]')
+        res = self.client.get(USERS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 0)
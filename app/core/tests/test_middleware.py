@@ -0,0 +1,216 @@
+"""
+Tests for the response compression middleware.
+"""
+import gzip
+import json
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache as default_cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import middleware
+from core.middleware import CompressionMiddleware, cached_compress, negotiate
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+BODY = json.dumps([{'id': pk, 'title': 'Soup'} for pk in range(100)]).encode()
+
+
+def apply(response, accept_encoding='gzip'):
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompressionMiddleware(lambda request: response)(request)
+
+
+class NegotiateTests(SimpleTestCase):
+    """Test choosing a coding from Accept-Encoding."""
+
+    def test_gzip(self):
+        self.assertEqual(negotiate('gzip, deflate'), 'gzip')
+        self.assertEqual(negotiate('GZIP;q=0.5'), 'gzip')
+        self.assertEqual(negotiate('*'), 'gzip')
+
+    def test_identity(self):
+        self.assertIsNone(negotiate(''))
+        self.assertIsNone(negotiate('deflate'))
+        self.assertIsNone(negotiate('gzip;q=0'))
+        self.assertIsNone(negotiate('*;q=0'))
+        self.assertIsNone(negotiate('gzip;q=x'))
+
+    def test_brotli_preferred_when_installed(self):
+        with mock.patch('core.middleware.brotli', None):
+            self.assertEqual(negotiate('gzip, br'), 'gzip')
+        with mock.patch('core.middleware.brotli', mock.Mock()):
+            self.assertEqual(negotiate('gzip, br'), 'br')
+            self.assertEqual(negotiate('br;q=0.5, gzip'), 'gzip')
+            self.assertEqual(negotiate('gzip, *;q=0.1'), 'gzip')
+            self.assertEqual(negotiate('*'), 'gzip')
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Test which responses are compressed, and how."""
+
+    def test_compresses_json(self):
+        response = apply(HttpResponse(BODY, content_type='application/json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(
+            int(response['Content-Length']), len(response.content),
+        )
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_identity_still_varies(self):
+        response = apply(
+            HttpResponse(BODY, content_type='application/json'), '',
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, BODY)
+
+    def test_skips_small_binary_and_encoded_responses(self):
+        responses = [
+            HttpResponse(b'{}', content_type='application/json'),
+            HttpResponse(BODY, content_type='image/jpeg'),
+        ]
+        encoded = HttpResponse(BODY, content_type='application/json')
+        encoded['Content-Encoding'] = 'identity'
+        responses.append(encoded)
+        for response in responses:
+            with self.subTest(content_type=response['Content-Type']):
+                content = response.content
+                response = apply(response)
+                self.assertEqual(response.content, content)
+                self.assertFalse(response.has_header('Vary'))
+
+    @override_settings(COMPRESSION_MIN_SIZE=len(BODY) + 1)
+    def test_min_size_setting(self):
+        response = apply(HttpResponse(BODY, content_type='application/json'))
+        self.assertEqual(response.content, BODY)
+
+    def test_gzip_level_setting(self):
+        # The gzip header's XFL byte records the fastest and best levels.
+        for level, xfl in ((1, 4), (9, 2)):
+            with self.subTest(level=level), \
+                    override_settings(COMPRESSION_GZIP_LEVEL=level):
+                response = apply(
+                    HttpResponse(BODY, content_type='application/json'),
+                )
+                self.assertEqual(response.content[8], xfl)
+
+    def test_strong_etag_is_weakened(self):
+        response = HttpResponse(BODY, content_type='application/json')
+        response['ETag'] = '"abc"'
+        self.assertEqual(apply(response)['ETag'], 'W/"abc"')
+
+    def test_streaming(self):
+        chunks = [line + b'\n' for line in BODY.split(b',')]
+        response = apply(
+            StreamingHttpResponse(chunks, content_type='application/x-ndjson'),
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)),
+            b''.join(chunks),
+        )
+
+    @unittest.skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        response = apply(
+            HttpResponse(BODY, content_type='application/json'), 'br',
+        )
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(middleware.brotli.decompress(response.content), BODY)
+
+    @unittest.skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli_streaming(self):
+        chunks = [line + b'\n' for line in BODY.split(b',')]
+        response = apply(
+            StreamingHttpResponse(chunks, content_type='application/x-ndjson'),
+            'gzip, br',
+        )
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(
+            middleware.brotli.decompress(b''.join(response.streaming_content)),
+            b''.join(chunks),
+        )
+
+
+class CachedVariantTests(TransactionTestCase):
+    """Test compressed bodies of cached recipe responses are reused."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test@123',
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.bulk_create(
+            Recipe(user=self.user, title=f'Recipe {pk}', time_minutes=pk,
+                   price=Decimal('5.00'))
+            for pk in range(30)
+        )
+
+    def get(self, url=RECIPES_URL):
+        return self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+
+    def test_cache_hit_is_not_recompressed(self):
+        with mock.patch('core.middleware.compress',
+                        wraps=middleware.compress) as compress:
+            first = self.get()
+            second = self.get()
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(second.content, first.content)
+        data = json.loads(gzip.decompress(second.content))
+        self.assertEqual(len(data['results']), len(first.data['results']))
+
+    def test_write_invalidates_variant(self):
+        first = self.get()
+        res = self.client.post(RECIPES_URL, {'title': 'New recipe'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        second = self.get()
+        self.assertEqual(second['X-Cache'], 'MISS')
+        self.assertNotEqual(second.content, first.content)
+        self.assertIn(b'New recipe', gzip.decompress(second.content))
+
+    @unittest.skipIf(middleware.brotli is None, 'brotli is not installed')
+    def test_brotli_variant_cached(self):
+        first = self.client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip, br')
+        with mock.patch('core.middleware.compress',
+                        wraps=middleware.compress) as compress:
+            second = self.client.get(
+                RECIPES_URL, HTTP_ACCEPT_ENCODING='gzip, br',
+            )
+        compress.assert_not_called()
+        self.assertEqual(second['Content-Encoding'], 'br')
+        self.assertEqual(second.content, first.content)
+        data = json.loads(middleware.brotli.decompress(second.content))
+        self.assertEqual(len(data['results']), len(first.data['results']))
+
+    def test_variant_checked_against_body(self):
+        compressed = cached_compress(
+            BODY, 'gzip', default_cache, 'test:variant', 60,
+        )
+        self.assertEqual(gzip.decompress(compressed), BODY)
+        changed = cached_compress(
+            BODY[:-1], 'gzip', default_cache, 'test:variant', 60,
+        )
+        self.assertEqual(gzip.decompress(changed), BODY[:-1])
+
+    def test_export_is_compressed(self):
+        res = self.get(EXPORT_URL + '?format=ndjson')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(res.streaming_content)).splitlines()
+        self.assertEqual(len(lines), 30)
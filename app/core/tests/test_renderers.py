@@ -0,0 +1,265 @@
+"""
+Tests for the orjson renderer and parser.
+"""
+import datetime
+import inspect
+import io
+import json
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db.models import QuerySet
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import serializers, status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+import core.serializers
+import recipe.serializers
+import user.serializers
+from core.management.commands.stub_upstream import fake_camera, fake_user
+from core.models import Recipe, Tag
+from core.parsers import ORJSONParser
+from core.renderers import ORJSONRenderer
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def parse(parser, content, **context):
+    return parser.parse(io.BytesIO(content), 'application/json', context)
+
+
+class RenderParseMixin:
+    """Compare ORJSONRenderer/ORJSONParser with DRF's JSON classes"""
+
+    def assertRendersAsDRF(self, data, accepted_media_type=None):
+        content = ORJSONRenderer().render(data, accepted_media_type)
+        self.assertEqual(
+            content, JSONRenderer().render(data, accepted_media_type),
+        )
+        return content
+
+    def assertRoundTrips(self, data):
+        content = self.assertRendersAsDRF(data)
+        parsed = parse(ORJSONParser(), content)
+        self.assertEqual(parsed, parse(JSONParser(), content))
+        return parsed
+
+
+class SerializerRoundTripTests(RenderParseMixin, TestCase):
+    """Every API serializer renders and parses like DRF's JSON classes."""
+
+    modules = (core.serializers, user.serializers, recipe.serializers)
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com', password='testpass123',
+            name='Zoë \u2028 Test',
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Crème brûlée\u2029', time_minutes=30,
+            price=Decimal('5.50'), link='https://example.com/r',
+            description='Sweet',
+        )
+        self.recipe.tags.add(
+            Tag.objects.create(user=self.user, name='Dessert'),
+            Tag.objects.create(user=self.user, name='French'),
+        )
+
+    def serializer_data(self):
+        """Return {serializer class: rendered data} for every serializer."""
+        camera = fake_camera(1)
+        camera['groups'] = ['lobby', 'ünïcode']
+        instances = {
+            core.serializers.GeoSerializer: {'lat': '23.8', 'lng': '90.4'},
+            core.serializers.AddressSerializer: fake_user(1)['address'],
+            core.serializers.CompanySerializer: fake_user(1)['company'],
+            core.serializers.UserSerializer: [fake_user(1), fake_user(2)],
+            core.serializers.AudioStreamSerializer: {
+                'accessPoint': 'hosts/a', 'isActivated': True,
+            },
+            core.serializers.VideoStreamSerializer: {
+                'accessPoint': 'hosts/a',
+            },
+            core.serializers.CameraSerializer: camera,
+            user.serializers.UserSerializer: self.user,
+            user.serializers.AuthTokenSerializer: {
+                'email': self.user.email, 'password': 'testpass123',
+            },
+            recipe.serializers.UserSerializer: self.user,
+            recipe.serializers.TagSerializer: self.recipe.tags.all(),
+            recipe.serializers.RecipeSerializer: [self.recipe],
+            recipe.serializers.RecipeDetailSerializer: self.recipe,
+        }
+        many = (list, QuerySet)
+        data = {
+            cls: cls(instance, many=isinstance(instance, many)).data
+            for cls, instance in instances.items()
+        }
+        token_serializer = user.serializers.ClaimsTokenObtainPairSerializer
+        data[token_serializer] = self.token_data()
+        return data
+
+    def token_data(self):
+        serializer = user.serializers.ClaimsTokenObtainPairSerializer(
+            data={'email': self.user.email, 'password': 'testpass123'},
+        )
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def test_every_serializer_is_covered(self):
+        defined = {
+            cls for module in self.modules
+            for _, cls in inspect.getmembers(module, inspect.isclass)
+            if cls.__module__ == module.__name__
+            and issubclass(cls, serializers.Serializer)
+        }
+        self.assertEqual(set(self.serializer_data()), defined)
+
+    def test_serializer_output_round_trips(self):
+        for serializer_class, data in self.serializer_data().items():
+            with self.subTest(serializer=serializer_class.__qualname__):
+                parsed = self.assertRoundTrips(data)
+                self.assertEqual(parsed, json.loads(json.dumps(data)))
+
+    def test_recipe_price_and_escapes(self):
+        content = self.assertRendersAsDRF(
+            recipe.serializers.RecipeDetailSerializer(self.recipe).data,
+        )
+        self.assertIn(b'"price":"5.50"', content)
+        self.assertIn(b'\\u2029', content)
+        self.assertIn('brûlée'.encode(), content)
+
+    def test_api_uses_orjson_classes(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = {'title': 'Soup \u2028', 'time_minutes': 10, 'price': '2.25',
+                   'tags': [{'name': 'Starter'}]}
+        res = client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Recipe.objects.get(id=res.data['id']).price, Decimal('2.25'),
+        )
+
+        res = client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.accepted_renderer, ORJSONRenderer)
+        self.assertEqual(res.content, JSONRenderer().render(res.data))
+
+
+class ORJSONRendererTests(RenderParseMixin, SimpleTestCase):
+    """Types DRF's encoder handles come out the same."""
+
+    def test_datetimes(self):
+        self.assertRendersAsDRF({
+            'utc': datetime.datetime(
+                2024, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc,
+            ),
+            'offset': datetime.datetime(
+                2024, 1, 2, 3, 4, 5,
+                tzinfo=datetime.timezone(datetime.timedelta(hours=6))),
+            'naive': datetime.datetime(2024, 1, 2, 3, 4, 5),
+            'date': datetime.date(2024, 1, 2),
+            'time': datetime.time(3, 4, 5, 6),
+            'delta': datetime.timedelta(minutes=90),
+        })
+        content = ORJSONRenderer().render(
+            {'at': datetime.datetime(2024, 1, 2, tzinfo=timezone.utc)})
+        self.assertEqual(content, b'{"at":"2024-01-02T00:00:00Z"}')
+
+    def test_aware_time_is_rejected(self):
+        value = datetime.time(3, 4, tzinfo=timezone.utc)
+        with self.assertRaises(ValueError):
+            ORJSONRenderer().render({'time': value})
+
+    def test_decimal_lazy_string_and_uuid(self):
+        self.assertRendersAsDRF({
+            'price': Decimal('5.50'),
+            'detail': gettext_lazy('Not found.'),
+            'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'tuple': (1, 2),
+            'bytes': b'raw',
+        })
+
+    def test_non_str_keys_and_unicode(self):
+        self.assertRendersAsDRF(
+            {1: 'one', None: 'null', 'text': 'a\u2028b\u2029c ü €'},
+        )
+
+    def test_large_int_falls_back(self):
+        self.assertRendersAsDRF({'big': 2 ** 70})
+
+    def test_non_finite_floats_as_drf(self):
+        """Test NaN and Infinity follow STRICT_JSON like DRF's renderer"""
+        for value in (
+            float('nan'), float('inf'), -float('inf'), Decimal('NaN')
+        ):
+            data = {'a': [None, {'b': value}]}
+            with self.assertRaises(ValueError):
+                JSONRenderer().render(data)
+            with self.assertRaises(ValueError):
+                ORJSONRenderer().render(data)
+        with mock.patch.object(JSONRenderer, 'strict', False):
+            self.assertRendersAsDRF({'a': float('nan'), 'b': None})
+        self.assertRendersAsDRF({'a': None, 'b': 1.5, 'c': Decimal('2.5')})
+
+    def test_none_and_indent(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        self.assertRendersAsDRF({'a': [1, 2]}, 'application/json; indent=4')
+
+    def test_without_orjson(self):
+        data = {'price': Decimal('1.10'), 'at': datetime.date(2024, 1, 2)}
+        with mock.patch('core.renderers.orjson', None), \
+                mock.patch('core.parsers.orjson', None):
+            self.assertRoundTrips(data)
+
+
+class ORJSONParserTests(SimpleTestCase):
+    """Parsing errors and encodings match JSONParser."""
+
+    def test_invalid_json(self):
+        for content in (b'{"a":', b'{"a": NaN}', b''):
+            with self.subTest(content=content), self.assertRaises(ParseError):
+                parse(ORJSONParser(), content)
+
+    def test_errors_match_json_parser(self):
+        for content in (b'{"a":', b'{"a": NaN}', b'', b'[-Infinity]'):
+            with self.subTest(content=content):
+                with self.assertRaises(ParseError) as drf:
+                    parse(JSONParser(), content)
+                with self.assertRaises(ParseError) as ours:
+                    parse(ORJSONParser(), content)
+                self.assertEqual(str(ours.exception), str(drf.exception))
+
+    def test_numbers_beyond_double_and_int64(self):
+        """Test numbers orjson reads differently parse as with JSONParser"""
+        for content in (
+            b'{"a": 123456789012345678901234567890}',
+            b'{"a": -9223372036854775809}',
+            b'[18446744073709551616, 1.5]',
+            b'{"a": 1e400, "b": -1e400}',
+        ):
+            with self.subTest(content=content):
+                self.assertEqual(
+                    parse(ORJSONParser(), content),
+                    parse(JSONParser(), content),
+                )
+        parsed = parse(
+            ORJSONParser(), b'{"a": 123456789012345678901234567890}',
+        )
+        self.assertEqual(parsed['a'], 123456789012345678901234567890)
+        self.assertIsInstance(parsed['a'], int)
+
+    def test_other_charset_falls_back(self):
+        content = '{"name": "Zoë"}'.encode('latin-1')
+        self.assertEqual(
+            parse(ORJSONParser(), content, encoding='latin-1'),
+            {'name': 'Zoë'},
+        )
@@ -0,0 +1,211 @@
+"""
+Tests for the camera snapshot proxy and its disk cache.
+"""
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import snapshots
+from core.cameras import open_snapshot, refresh_snapshot
+from core.management.commands.stub_upstream import fake_camera, make_server
+from core.snapshots import SnapshotCache, get_snapshot_cache
+
+
+def snapshot_url(display_id):
+    return reverse('get_camera_snapshot', args=[display_id])
+
+
+class SnapshotCacheTests(TestCase):
+    """Test the on-disk LRU."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def store(self, cache, key, data):
+        return b''.join(cache.tee(key, iter([data])))
+
+    def test_stored_snapshot_hit(self):
+        cache = SnapshotCache(self.directory, max_bytes=1000, ttl=60)
+        self.assertIsNone(cache.get('1'))
+        self.assertEqual(self.store(cache, '1', b'jpeg'), b'jpeg')
+        with open(cache.get('1'), 'rb') as cached:
+            self.assertEqual(cached.read(), b'jpeg')
+
+    def test_expired_snapshot_missed(self):
+        cache = SnapshotCache(self.directory, max_bytes=1000, ttl=60)
+        self.store(cache, '1', b'jpeg')
+        path = cache.path('1')
+        os.utime(path, (time.time(), time.time() - 61))
+        self.assertIsNone(cache.get('1'))
+
+    def test_least_recently_read_evicted(self):
+        cache = SnapshotCache(self.directory, max_bytes=10, ttl=60)
+        self.store(cache, 'a', b'aaaa')
+        self.store(cache, 'b', b'bbbb')
+        past = time.time() - 30
+        os.utime(cache.path('a'), (past, past))
+        os.utime(cache.path('b'), (past - 10, past))
+        cache.get('b')
+        self.store(cache, 'c', b'cccc')
+        self.assertIsNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+    def test_directory_scanned_only_past_limit(self):
+        cache = SnapshotCache(self.directory, max_bytes=10, ttl=60)
+        self.store(cache, 'a', b'aaaa')
+        with mock.patch.object(SnapshotCache, '_evict', autospec=True,
+                               return_value=8) as evict:
+            self.store(cache, 'b', b'bbbb')
+            # Replacing a file only counts the difference.
+            self.store(cache, 'b', b'bbbb')
+            evict.assert_not_called()
+            self.store(cache, 'c', b'cccc')
+            evict.assert_called_once()
+
+    def test_lock_makes_misses_wait(self):
+        cache = SnapshotCache(self.directory, max_bytes=1000, ttl=60)
+        release = cache.lock('1', timeout=5)
+        threading.Timer(0.2, release).start()
+        start = time.monotonic()
+        cache.lock('1', timeout=5)()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertEqual(snapshots._key_locks, {})
+
+    def test_interrupted_stream_not_cached(self):
+        cache = SnapshotCache(self.directory, max_bytes=1000, ttl=60)
+        stream = cache.tee('1', iter([b'part', b'rest']))
+        next(stream)
+        stream.close()
+        self.assertIsNone(cache.get('1'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+
+class SnapshotProxyTests(TestCase):
+    """Test proxying snapshots from the stub camera server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = make_server('127.0.0.1', 0)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            CAMERA_SOURCES=[{
+                'name': 'stub',
+                'url': f'http://127.0.0.1:{self.server.server_address[1]}',
+                'auth': ('root', 'secret'),
+            }],
+            CAMERA_SNAPSHOT_DIR=directory.name,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        refresh_snapshot([fake_camera(1)], source='stub')
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test@123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        """Test anonymous clients can't reach the cameras"""
+        res = APIClient().get(snapshot_url('1'))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_miss_streamed_then_hit_from_disk(self):
+        res = self.client.get(snapshot_url('1'))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        body = b''.join(res.streaming_content)
+        self.assertTrue(body.startswith(b'\xff\xd8'))
+
+        res = self.client.get(snapshot_url('1'))
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(b''.join(res.streaming_content), body)
+        res.close()
+
+    def test_unknown_camera_404(self):
+        res = self.client.get(snapshot_url('missing'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_snapshot_taken_from_video_stream(self):
+        """Test the camera server is asked for the first video stream"""
+        with mock.patch('core.cameras.client.get') as get:
+            get.return_value.status_code = 404
+            self.client.get(snapshot_url('1'))
+        self.assertTrue(get.call_args.args[0].endswith(
+            '/live/media/snapshot/hosts/STUB/DeviceIpint.1/'
+            'SourceEndpoint.video:0:0'
+        ))
+
+    def test_camera_without_video_stream_404(self):
+        refresh_snapshot(
+            [{**fake_camera(2), 'videoStreams': []}], source='stub',
+        )
+        res = self.client.get(snapshot_url('2'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(
+        CAMERA_SOURCES=[{'name': 'stub', 'url': 'http://127.0.0.1:1'}],
+    )
+    def test_unreachable_camera_502(self):
+        res = self.client.get(snapshot_url('1'))
+        self.assertEqual(res.status_code, status.HTTP_502_BAD_GATEWAY)
+
+    def test_concurrent_miss_waits_for_fetch(self):
+        """Test a miss during another request's fetch reads its file"""
+        cache = get_snapshot_cache()
+        release = cache.lock('1', timeout=5)
+
+        def fetch_elsewhere():
+            time.sleep(0.2)
+            b''.join(cache.tee('1', iter([b'\xff\xd8jpeg'])))
+            release()
+
+        thread = threading.Thread(target=fetch_elsewhere)
+        thread.start()
+        with mock.patch('core.views.open_snapshot') as fetch:
+            res = self.client.get(snapshot_url('1'))
+        thread.join()
+        fetch.assert_not_called()
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(b''.join(res.streaming_content), b'\xff\xd8jpeg')
+        res.close()
+
+    def test_unread_miss_releases_upstream(self):
+        """Test closing an unread miss closes the camera's response"""
+        upstreams = []
+
+        def recording_open(camera, source):
+            upstream = open_snapshot(camera, source)
+            upstream.close = mock.Mock(wraps=upstream.close)
+            upstreams.append(upstream)
+            return upstream
+
+        with mock.patch('core.views.open_snapshot', recording_open):
+            res = self.client.get(snapshot_url('1'))
+        self.assertEqual(res['X-Cache'], 'MISS')
+        res.close()
+        upstreams[0].close.assert_called()
+        self.assertEqual(snapshots._key_locks, {})
+        self.assertIsNone(get_snapshot_cache().get('1'))
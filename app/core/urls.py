@@ -1,13 +1,20 @@
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
-
 from django.urls import path
-from . import views
+from user.views import CreateJWTView
+from . import async_views, views
 urlpatterns = [
-    path('users/login/', TokenObtainPairView.as_view(), name='user_login'),
+    path('users/login/', CreateJWTView.as_view(), name='user_login'),
     path('get-data/', views.get_user_data, name="get_user_data"),
     path('create/', views.post_user, name='create_user'),
     path('cameras/', views.get_cameras, name="get_cameras"),
+    path(
+        'cameras/<str:display_id>/snapshot/',
+        views.get_camera_snapshot,
+        name="get_camera_snapshot",
+    ),
+    path(
+        'async/get-data/', async_views.get_user_data,
+        name="async_get_user_data",
+    ),
+    path('async/create/', async_views.post_user, name='async_create_user'),
+    path('async/cameras/', async_views.get_cameras, name="async_get_cameras"),
 ]
\ No newline at end of file
@@ -1,22 +1,105 @@
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-import requests
-from .serializers import UserSerializer, CameraSerializer
+from .cache import cached_fetch
+from .cameras import (
+    fill_snapshot,
+    filter_cameras,
+    get_source,
+    iter_snapshot,
+    open_snapshot,
+    refresh_in_background,
+    source_status,
+)
+from .http import CircuitOpen, UpstreamError, client
+from .models import Camera
+from .serializers import UserSerializer
+from .snapshots import get_snapshot_cache
 from rest_framework.pagination import LimitOffsetPagination
 
 class CustomLimitOffsetPagination(LimitOffsetPagination):
     default_limit = 3
     max_limit = 8
 
-@api_view(['GET'])
-def get_user_data(request):
-    response = requests.get('https://jsonplaceholder.typicode.com/users').json()
 
+class BadGateway(APIException):
+    status_code = status.HTTP_502_BAD_GATEWAY
+    default_detail = 'The upstream service failed.'
+    default_code = 'bad_gateway'
+
+
+class UpstreamUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The upstream service is temporarily unavailable.'
+    default_code = 'upstream_unavailable'
+
+
+def fetch_json(method, url, **kwargs):
+    """Call an upstream API through the shared client and decode its JSON.
+
+    Raises 503 while the host's circuit is open and 502 for failed calls
+    or bodies that aren't JSON.
+    """
+    try:
+        return client.request(method, url, **kwargs).json()
+    except CircuitOpen as exc:
+        raise UpstreamUnavailable() from exc
+    except (UpstreamError, ValueError) as exc:
+        raise BadGateway() from exc
+
+
+def cached_page(request, name, fetch, serializer_class):
+    """Paginate a cached upstream list, tagging the response with X-Cache."""
+    data, state = cached_fetch(name, fetch)
+    paginator = CustomLimitOffsetPagination()
+    paginated_response = paginator.paginate_queryset(data, request)
+    serializer = serializer_class(paginated_response, many=True)
+    response = paginator.get_paginated_response(serializer.data)
+    response['X-Cache'] = state
+    return response
+
+
+def camera_page(request):
+    """Page and filter the stored camera snapshot.
+
+    An empty snapshot is fetched before answering by the one request
+    claiming it (the others get an empty page); a stale one is served
+    as is while it is refreshed in the background. Sources whose latest
+    fetch failed are listed under errors.
+    """
+    result = None if Camera.objects.exists() else fill_snapshot()
+    if result is None:
+        errors, stale = source_status()
+        if stale:
+            refresh_in_background()
+    else:
+        counts, errors = result
+        if not counts and errors:
+            raise BadGateway(
+                {'detail': BadGateway.default_detail, 'errors': errors},
+            )
+    queryset = filter_cameras(Camera.objects.all(), request.query_params)
     paginator = CustomLimitOffsetPagination()
-    paginated_response = paginator.paginate_queryset(response, request)
-    serializer = UserSerializer(paginated_response, many=True)
-    return paginator.get_paginated_response(serializer.data)
+    payloads = paginator.paginate_queryset(
+        queryset.order_by('display_id').values_list('payload', flat=True),
+        request,
+    )
+    response = paginator.get_paginated_response(payloads)
+    response.data['errors'] = errors
+    return response
+
+
+@api_view(['GET'])
+def get_user_data(request):
+    return cached_page(
+        request, 'users', lambda: fetch_json('GET', settings.USERS_API_URL),
+        UserSerializer,
+    )
 
 @api_view(['POST'])
 @permission_classes([IsAdminUser]) # type: ignore
@@ -53,8 +136,7 @@ def post_user(request):
     #     'company':company
     # }
     data = request.data
-    url = requests.post('https://jsonplaceholder.typicode.com/posts', json=data)
-    response_data = url.json()
+    response_data = fetch_json('POST', settings.POSTS_API_URL, json=data)
     serializer = UserSerializer(data=response_data)
 
     if serializer.is_valid():
@@ -64,21 +146,101 @@ def post_user(request):
     
 @api_view(['GET'])
 def get_cameras(request):
-    vendor_sid = 'root'
-    vendor_key = 'Accelx123456'
-    base_url = '192.168.1.13:8000'
-    auth = (vendor_sid, vendor_key)
+    return camera_page(request)
 
-    headers = {
-        'Content-type': 'Application/json'
-    }
-    api_url = f"http://{base_url}/camera/list"
-    response = requests.get(api_url, auth=auth, headers=headers)
 
-    
-    cameras_data = response.json().get('cameras', [])
-    paginator = CustomLimitOffsetPagination()
-    paginated_response = paginator.paginate_queryset(cameras_data, request)
-    serializer = CameraSerializer(paginated_response, many=True)
-    return paginator.get_paginated_response(serializer.data)
+def _cached_snapshot(snapshots, display_id):
+    path = snapshots.get(display_id)
+    if path is None:
+        return None
+    try:
+        response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+    except FileNotFoundError:
+        # Evicted between the lookup and the open.
+        return None
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+class _SnapshotStream:
+    """Chunks of a snapshot miss; closing releases what the fetch holds.
+
+    Django closes the response even when it is never iterated, which a
+    generator's own finally can't cover.
+    """
+
+    def __init__(self, chunks, upstream, release):
+        self.chunks = chunks
+        self.upstream = upstream
+        self.release = release
+
+    def __iter__(self):
+        try:
+            yield from self.chunks
+        finally:
+            self.close()
+
+    def close(self):
+        try:
+            self.chunks.close()
+            self.upstream.close()
+        finally:
+            self.release()
+
+
+def _fetch_snapshot(snapshots, camera, source, release):
+    try:
+        upstream = open_snapshot(camera, source)
+    except CircuitOpen as exc:
+        raise UpstreamUnavailable() from exc
+    except UpstreamError as exc:
+        raise BadGateway() from exc
+    if upstream.status_code != 200:
+        upstream.close()
+        raise BadGateway()
+    chunks = iter_snapshot(upstream, settings.CAMERA_SNAPSHOT_CHUNK_SIZE)
+    return StreamingHttpResponse(
+        _SnapshotStream(
+            snapshots.tee(camera.display_id, chunks), upstream, release,
+        ),
+        content_type=upstream.headers.get('Content-Type', 'image/jpeg'),
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])  # type: ignore
+def get_camera_snapshot(request, display_id):
+    """Proxy a camera's JPEG snapshot through the on-disk cache.
 
+    Hits are sent with FileResponse, which lets the server use sendfile;
+    misses are streamed from the camera and written to the cache as they
+    pass through. Concurrent misses of a camera in a process wait for
+    the first one's fetch and then read its file.
+    """
+    # Cameras without a video stream have nothing to take snapshots of.
+    camera = get_object_or_404(
+        Camera.objects.exclude(stream_access_point=''), display_id=display_id,
+    )
+    snapshots = get_snapshot_cache()
+    response = _cached_snapshot(snapshots, display_id)
+    if response is None:
+        source = get_source(camera.source)
+        if source is None:
+            raise BadGateway()
+        release = snapshots.lock(
+            display_id,
+            timeout=source.get('timeout', settings.UPSTREAM_READ_TIMEOUT),
+        )
+        response = _cached_snapshot(snapshots, display_id)
+        if response is not None:
+            release()
+        else:
+            try:
+                response = _fetch_snapshot(snapshots, camera, source, release)
+            except BaseException:
+                release()
+                raise
+            response['X-Cache'] = 'MISS'
+    max_age = settings.CAMERA_SNAPSHOT_TTL
+    response['Cache-Control'] = f'private, max-age={max_age}'
+    return response
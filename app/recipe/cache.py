@@ -0,0 +1,217 @@
+"""Per-user response cache for the recipe API.
+
+Cached GET responses are keyed by user, view, action, object id,
+scheme, host, query string and a per-user version number. Writes to a
+user's recipes or tags bump that version in the database, once per
+transaction, which orphans the user's cached responses in every worker
+at once; orphaned entries simply expire. Compressed bodies of cached
+responses are stored under the same key by core.middleware.
+"""
+import threading
+import time
+import weakref
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from rest_framework.response import Response
+
+from core.models import CacheVersion, Recipe, Tag
+
+RESPONSE_KEY = (
+    'recipe:response:{user_id}:{version}:{view}:{action}:{pk}:'
+    '{scheme}:{host}:{query}'
+)
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_cache():
+    return caches[settings.RECIPE_CACHE_ALIAS]
+
+
+def _fresh_version():
+    # Start from the clock rather than 1 so that a reused user id can't
+    # come back with a number that was already used.
+    return time.time_ns() // 1000
+
+
+def _latest_update(user_id):
+    stamps = [
+        model.objects.filter(user_id=user_id)
+        .aggregate(latest=Max('updated_at'))['latest']
+        for model in (Recipe, Tag)
+    ]
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return max(stamps) if stamps else None
+
+
+def get_state(user_id):
+    """Return (version, last modified in epoch seconds) of user_id.
+
+    Both come from the user's CacheVersion row, so every worker agrees
+    on them. The row is created on first use, dated by the newest
+    updated_at of the user's recipes and tags (0 when there are none).
+    """
+    row = (
+        CacheVersion.objects.filter(user_id=user_id)
+        .values_list('version', 'modified_at')
+        .first()
+    )
+    if row is None:
+        created, _ = CacheVersion.objects.get_or_create(
+            user_id=user_id,
+            defaults={
+                'version': _fresh_version(),
+                'modified_at': _latest_update(user_id),
+            },
+        )
+        row = (created.version, created.modified_at)
+    version, modified_at = row
+    return version, int(modified_at.timestamp()) if modified_at else 0
+
+
+def request_state(request):
+    """get_state() of request.user, read once per request."""
+    try:
+        return request._recipe_cache_state
+    except AttributeError:
+        state = request._recipe_cache_state = get_state(request.user.id)
+        return state
+
+
+def get_version(user_id):
+    """Return the current cache version for user_id."""
+    return get_state(user_id)[0]
+
+
+def get_last_modified(user_id):
+    """Return when user_id's recipes or tags last changed, in epoch seconds."""
+    return get_state(user_id)[1]
+
+
+def bump_version(user_id):
+    """Invalidate every cached response of user_id right away."""
+    now = timezone.now()
+    bump = CacheVersion.objects.filter(user_id=user_id)
+    if bump.update(version=F('version') + 1, modified_at=now):
+        return
+    _, created = CacheVersion.objects.get_or_create(
+        user_id=user_id,
+        defaults={'version': _fresh_version(), 'modified_at': now},
+    )
+    if not created:
+        bump.update(version=F('version') + 1, modified_at=now)
+
+
+class _PendingBumps(set):
+    """User ids to bump when the current transaction commits."""
+
+
+def _bump_pending(connection, pending):
+    if connection._recipe_pending_bumps() is pending:
+        connection._recipe_pending_bumps = None
+    for user_id in sorted(pending):
+        bump_version(user_id)
+
+
+def invalidate(user_id):
+    """Invalidate user_id's cached responses once the transaction commits.
+
+    However many recipes and tags one transaction writes, each owner's
+    CacheVersion row is updated once. Outside a transaction the bump
+    happens right away.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        bump_version(user_id)
+        return
+    # Only the on_commit callback holds the set, so a rolled back
+    # transaction drops it and the next one starts afresh.
+    ref = getattr(connection, '_recipe_pending_bumps', None)
+    pending = ref() if ref is not None else None
+    if pending is None:
+        pending = _PendingBumps()
+        connection._recipe_pending_bumps = weakref.ref(pending)
+        transaction.on_commit(lambda: _bump_pending(connection, pending))
+    pending.add(user_id)
+
+
+def record(hit):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def stats():
+    """Return the hit/miss counters of this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+def response_key(view, request):
+    """Build the cache key of a GET request handled by view."""
+    return RESPONSE_KEY.format(
+        user_id=request.user.id,
+        version=request_state(request)[0],
+        view=view.basename,
+        action=view.action,
+        pk=view.kwargs.get(view.lookup_url_kwarg or view.lookup_field, ''),
+        # Pagination links are absolute URLs.
+        scheme=request.scheme,
+        host=request.get_host(),
+        query=urlencode(sorted(request.query_params.lists()), doseq=True),
+    )
+
+
+class CachedListMixin:
+    """Cache list responses per user, invalidated on writes"""
+    cache_header = 'X-Cache'
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        cache = get_cache()
+        key = response_key(self, request)
+        data = cache.get(key)
+        if data is not None:
+            record(hit=True)
+            response = Response(data)
+            response[self.cache_header] = 'HIT'
+            response.compression_cache = (
+                cache, key, settings.RECIPE_CACHE_TIMEOUT
+            )
+            return response
+
+        record(hit=False)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RECIPE_CACHE_TIMEOUT)
+            # Lets core.middleware keep the compressed bodies next to it.
+            response.compression_cache = (
+                cache, key, settings.RECIPE_CACHE_TIMEOUT
+            )
+        response[self.cache_header] = 'MISS'
+        return response
+
+
+class CachedResponseMixin(CachedListMixin):
+    """Cache list/retrieve responses per user, invalidated on writes.
+
+    Only for views with a retrieve action: defining retrieve makes the
+    router route GET on the detail URL.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(
+            super().retrieve, request, *args, **kwargs,
+        )
@@ -0,0 +1,50 @@
+"""Conditional GET (ETag / Last-Modified) for the recipe API.
+
+Validators come from the per-user version and modification time that
+recipe.cache keeps in the database, so a 304 costs one primary key
+lookup and no serializing.
+"""
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+from recipe.cache import request_state
+
+
+class ConditionalListMixin:
+    """Answer list with 304 Not Modified when the client is current"""
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(
+            super().list, request, *args, **kwargs,
+        )
+
+    def _conditional_response(self, handler, request, *args, **kwargs):
+        # Read the validators before building the response, so a write
+        # racing with this request can only make them look older.
+        version, last_modified = request_state(request)
+        etag = f'W/"{version}"'
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified or None
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Authorization'])
+        return response
+
+
+class ConditionalGetMixin(ConditionalListMixin):
+    """Answer list/retrieve with 304 Not Modified when the client is current.
+
+    Only for views with a retrieve action, like CachedResponseMixin.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(
+            super().retrieve, request, *args, **kwargs,
+        )
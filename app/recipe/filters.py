@@ -0,0 +1,146 @@
+"""Query parameter filters for the recipe list"""
+import sys
+
+from django.db import connections
+from django.db.models import Count
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from core.models import Recipe
+
+TAG_MATCH_MODES = ('any', 'all')
+
+# Largest values of the IntegerField and BigAutoField columns filtered on;
+# bigger ones would overflow in the database driver.
+MAX_INT = 2 ** 31 - 1
+MAX_ID = 2 ** 63 - 1
+
+
+def _check_range(name, value, limit):
+    if not -limit - 1 <= value <= limit:
+        raise ValidationError({name: [
+            f'Ensure this value is between {-limit - 1} and {limit}.',
+        ]})
+    return value
+
+
+def _params_to_ints(name, value):
+    """Convert a comma separated list of ids to a list of integers."""
+    try:
+        ids = [int(str_id) for str_id in value.split(',') if str_id.strip()]
+    except ValueError:
+        raise ValidationError(
+            {name: ['Expected a comma separated list of ids.']},
+        )
+    return [_check_range(name, id_, MAX_ID) for id_ in ids]
+
+
+def _param_to_int(name, value):
+    try:
+        return _check_range(name, int(value), MAX_INT)
+    except ValueError:
+        raise ValidationError({name: ['A valid integer is required.']})
+
+
+def _decimal_field(model_field):
+    return serializers.DecimalField(
+        max_digits=model_field.max_digits,
+        decimal_places=model_field.decimal_places,
+    )
+
+
+# Filter values get the column's precision; NaN and Infinity are refused.
+PRICE_FIELD = _decimal_field(Recipe._meta.get_field('price'))
+
+
+def _param_to_decimal(name, value, field):
+    try:
+        return field.to_internal_value(value)
+    except ValidationError as exc:
+        raise ValidationError({name: exc.detail})
+
+
+def _prefix_upper_bound(prefix):
+    """Return the smallest string above every string starting with prefix.
+
+    Returns None when there is none, i.e. prefix is all U+10FFFF.
+    """
+    while prefix:
+        last = ord(prefix[-1]) + 1
+        if 0xD800 <= last <= 0xDFFF:
+            # Surrogates can't be stored; skip to the next real character.
+            last = 0xE000
+        if last <= sys.maxunicode:
+            return prefix[:-1] + chr(last)
+        prefix = prefix[:-1]
+    return None
+
+
+def _recipes_with_tags(tag_ids, match):
+    """Subquery of recipe ids carrying any/all of the tags.
+
+    Using a semi-join rather than joining the tags onto the recipes keeps
+    one row per recipe, so no DISTINCT is needed.
+    """
+    links = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+    if match == 'all':
+        links = (
+            links.values('recipe_id')
+            .annotate(matched=Count('tag_id'))
+            .filter(matched=len(set(tag_ids)))
+        )
+    return links.values('recipe_id')
+
+
+def filter_recipes(queryset, params):
+    """Apply the list filters in params to a recipe queryset.
+
+    Supported parameters:
+        tags: comma separated tag ids
+        tags_match: 'any' (default) or 'all' of the tags
+        max_time_minutes: upper bound on time_minutes
+        price_min, price_max: inclusive price range
+        title: case sensitive title prefix
+    """
+    tags = params.get('tags')
+    if tags:
+        match = params.get('tags_match', 'any')
+        if match not in TAG_MATCH_MODES:
+            modes = ', '.join(TAG_MATCH_MODES)
+            raise ValidationError({
+                'tags_match': [f'Expected one of {modes}.'],
+            })
+        tag_ids = _params_to_ints('tags', tags)
+        queryset = queryset.filter(id__in=_recipes_with_tags(tag_ids, match))
+
+    max_time = params.get('max_time_minutes')
+    if max_time:
+        queryset = queryset.filter(
+            time_minutes__lte=_param_to_int('max_time_minutes', max_time),
+        )
+
+    price_min = params.get('price_min')
+    if price_min:
+        queryset = queryset.filter(
+            price__gte=_param_to_decimal('price_min', price_min, PRICE_FIELD),
+        )
+
+    price_max = params.get('price_max')
+    if price_max:
+        queryset = queryset.filter(
+            price__lte=_param_to_decimal('price_max', price_max, PRICE_FIELD),
+        )
+
+    title = params.get('title')
+    if title:
+        queryset = queryset.filter(title__startswith=title)
+        # SQLite's LIKE can't use the (user, title) index, but its binary
+        # collation orders by code point, so a range on the title can.
+        # PostgreSQL collations needn't, and its LIKE uses the
+        # text_pattern_ops index instead.
+        if connections[queryset.db].vendor == 'sqlite':
+            queryset = queryset.filter(title__gte=title)
+            upper = _prefix_upper_bound(title)
+            if upper is not None:
+                queryset = queryset.filter(title__lt=upper)
+    return queryset
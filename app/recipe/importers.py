@@ -0,0 +1,85 @@
+"""Streaming readers for recipe import files.
+
+Each reader yields (line, item, error) tuples one row at a time, where
+item is a dict ready for RecipeSerializer and error describes a row that
+could not be parsed. The formats mirror the export renderers.
+"""
+import codecs
+import csv
+import json
+
+from recipe.renderers import CSVRenderer
+
+
+def iter_ndjson(upload):
+    """Read one JSON object per line, skipping blank lines."""
+    for line_no, line in enumerate(upload, 1):
+        try:
+            line = line.decode('utf-8').strip()
+            if not line:
+                continue
+            item = json.loads(line)
+        except (UnicodeDecodeError, ValueError):
+            yield line_no, None, {'non_field_errors': ['Invalid JSON.']}
+            continue
+        if not isinstance(item, dict):
+            errors = {'non_field_errors': ['Expected a JSON object.']}
+            yield line_no, None, errors
+            continue
+        yield line_no, item, None
+
+
+def iter_csv(upload):
+    """Read CSV rows with a header line, as written by CSVRenderer."""
+    reader = csv.DictReader(codecs.iterdecode(upload, 'utf-8'))
+    line_no = 1
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except (csv.Error, UnicodeDecodeError) as exc:
+            # The reader can't resume after a malformed line.
+            errors = {'non_field_errors': [str(exc)]}
+            yield reader.line_num or line_no, None, errors
+            return
+        line_no = reader.line_num
+        # Empty cells mean "no value", which the serializer spells by
+        # leaving the field out.
+        item = {
+            key: CSVRenderer.unquote_formula(value)
+            for key, value in row.items() if key and value not in ('', None)
+        }
+        item.pop('id', None)
+        tags = item.pop('tags', '')
+        item['tags'] = [
+            {'name': name} for name in CSVRenderer.split_tags(tags)
+        ]
+        yield line_no, item, None
+
+
+READERS = {
+    'ndjson': iter_ndjson,
+    'csv': iter_csv,
+}
+
+EXTENSIONS = {
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+    '.csv': 'csv',
+}
+
+CONTENT_TYPES = {
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+}
+
+
+def detect_format(upload):
+    """Guess the file format from the upload's name or content type."""
+    name = (upload.name or '').lower()
+    for extension, file_format in EXTENSIONS.items():
+        if name.endswith(extension):
+            return file_format
+    return CONTENT_TYPES.get(upload.content_type)
@@ -0,0 +1,117 @@
+"""
+Django command to compare the list serializers with their field plans.
+"""
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Recipe, Tag
+from recipe.plans import get_plan
+from recipe.serializers import RecipeSerializer, TagSerializer
+from recipe.views import tags_prefetch
+
+
+class Rollback(Exception):
+    """Raised to discard the benchmark data."""
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+class Command(BaseCommand):
+    """Time RecipeSerializer/TagSerializer lists against recipe.plans."""
+    help = 'Benchmark list serialization with and without the field plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='10,1000,100000',
+                            help='Comma separated list sizes.')
+        parser.add_argument('--tags-per-recipe', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['rows'].split(','))
+        except ValueError:
+            raise CommandError(
+                '--rows takes a comma separated list of integers.',
+            )
+        try:
+            with transaction.atomic():
+                self.run(sizes, options['tags_per_recipe'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def populate(self, count, tags_per_recipe):
+        user = get_user_model().objects.create_user(
+            email='benchmark@example.com', password='benchmark',
+        )
+        Tag.objects.bulk_create(
+            [Tag(user=user, name=f'tag {i}') for i in range(count)],
+            batch_size=1000,
+        )
+        Recipe.objects.bulk_create([
+            Recipe(user=user, title=f'Recipe {i}', time_minutes=i % 90,
+                   price=Decimal(i % 10000) / 100, link=f'{i}.pdf')
+            for i in range(count)
+        ], batch_size=1000)
+        tag_ids = list(
+            Tag.objects.filter(user=user).values_list('id', flat=True),
+        )
+        recipe_ids = Recipe.objects.filter(user=user).values_list(
+            'id', flat=True,
+        )
+        through = Recipe.tags.through
+        through.objects.bulk_create([
+            through(
+                recipe_id=recipe_id, tag_id=tag_ids[(n + k) % len(tag_ids)],
+            )
+            for n, recipe_id in enumerate(recipe_ids)
+            for k in range(min(tags_per_recipe, len(tag_ids)))
+        ], batch_size=1000)
+        return user
+
+    def run(self, sizes, tags_per_recipe, repeat):
+        user = self.populate(sizes[-1], tags_per_recipe)
+        cases = [
+            ('RecipeSerializer', RecipeSerializer,
+             Recipe.objects.filter(user=user).order_by('-id'), True),
+            ('TagSerializer', TagSerializer,
+             Tag.objects.filter(user=user).order_by('-name', 'id'), False),
+        ]
+        renderer = JSONRenderer()
+        for name, serializer_class, queryset, has_tags in cases:
+            plan = get_plan(serializer_class)
+            for size in sizes:
+                page = queryset[:size]
+                instances = page
+                if has_tags:
+                    instances = page.prefetch_related(tags_prefetch())
+                old_time, old = best_of(
+                    repeat,
+                    lambda: serializer_class(instances.all(), many=True).data,
+                )
+                new_time, new = best_of(
+                    repeat, lambda: plan.render(page.values(*plan.columns)),
+                )
+                same = renderer.render(old) == renderer.render(new)
+                self.stdout.write(
+                    f'{name} {size} rows: '
+                    f'serializer {old_time * 1000:.1f} ms, '
+                    f'plan {new_time * 1000:.1f} ms, '
+                    f'{old_time / new_time:.1f}x, identical JSON: {same}'
+                )
+                if not same:
+                    raise CommandError(
+                        f'{name} output differs at {size} rows.',
+                    )
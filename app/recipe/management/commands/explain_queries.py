@@ -0,0 +1,96 @@
+"""
+Django command to EXPLAIN the hot recipe and tag queries.
+"""
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Tombstone
+from recipe.filters import filter_recipes
+
+
+def hot_queries(user_id):
+    """Return (label, queryset) pairs mirroring the recipe API queries."""
+    through = Recipe.tags.through
+    recipes = Recipe.objects.filter(user_id=user_id).order_by('-id')
+    now = timezone.now()
+    return [
+        ('recipe list', Recipe.objects.filter(user_id=user_id)
+            .defer('description').order_by('-id')[:100]),
+        ('recipe list next page',
+            Recipe.objects.filter(user_id=user_id, id__lt=1000)
+            .defer('description').order_by('-id')[:100]),
+        ('recipe filter tags any', filter_recipes(
+            recipes, {'tags': '1,2'})[:100]),
+        ('recipe filter tags all', filter_recipes(
+            recipes, {'tags': '1,2', 'tags_match': 'all'})[:100]),
+        ('recipe filter time', filter_recipes(
+            recipes, {'max_time_minutes': '10'})[:100]),
+        ('recipe filter price', filter_recipes(
+            recipes, {'price_min': '1', 'price_max': '5'})[:100]),
+        ('recipe filter title', filter_recipes(
+            recipes, {'title': 'Pan'})[:100]),
+        ('recipe detail', Recipe.objects.filter(user_id=user_id, id=1)),
+        ('recipe tags', Tag.objects.filter(
+            recipe__id__in=[1, 2, 3]).only('id', 'name')),
+        ('tag list', Tag.objects.filter(
+            user_id=user_id).order_by('-name', 'id')[:100]),
+        ('tag resolution', Tag.objects.filter(
+            user_id=user_id, name__in=['a', 'b'])),
+        ('recipe tag links', through.objects.filter(recipe_id=1)),
+        ('sync recipes', Recipe.objects.filter(
+            user_id=user_id, updated_at__gte=now)),
+        ('sync tags', Tag.objects.filter(
+            user_id=user_id, updated_at__gte=now)),
+        ('sync tombstones', Tombstone.objects.filter(
+            user_id=user_id, deleted_at__gte=now)),
+    ]
+
+
+# Patterns for a plan step reading a whole table, per database vendor.
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!CONSTANT)(\w+)(?! USING)(?:\s|$)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+
+
+class Command(BaseCommand):
+    """Report hot queries that fall back to a full table scan."""
+    help = 'Run EXPLAIN on the hot recipe/tag queries and report full scans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, default=1)
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Exit with an error when a full scan is found.',
+        )
+        parser.add_argument(
+            '--show-plans', action='store_true',
+            help='Print the full plan of every query.',
+        )
+
+    def handle(self, *args, **options):
+        pattern = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(
+                f'Unsupported database vendor: {connection.vendor}',
+            )
+
+        full_scans = []
+        for label, queryset in hot_queries(options['user_id']):
+            plan = queryset.explain()
+            tables = pattern.findall(plan)
+            if tables:
+                full_scans.append(label)
+                self.stdout.write(self.style.ERROR(
+                    f'FULL SCAN {label}: {", ".join(tables)}'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK {label}'))
+            if options['show_plans'] or tables:
+                self.stdout.write(plan)
+
+        if full_scans and options['strict']:
+            raise CommandError(f'{len(full_scans)} queries use a full scan.')
@@ -0,0 +1,21 @@
+"""
+Django command to delete tombstones older than the sync retention.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+
+
+class Command(BaseCommand):
+    """Delete tombstones no sync token can still ask for."""
+    help = 'Delete tombstones older than RECIPE_SYNC_TOMBSTONE_DAYS.'
+
+    def handle(self, *args, **options):
+        keep = timedelta(days=settings.RECIPE_SYNC_TOMBSTONE_DAYS)
+        cutoff = timezone.now() - keep
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones.'))
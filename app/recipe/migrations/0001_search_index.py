@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from recipe.search import get_backend
+
+
+def install_search_index(apps, schema_editor):
+    get_backend(schema_editor.connection.vendor).install(schema_editor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    get_backend(schema_editor.connection.vendor).uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_recipe_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
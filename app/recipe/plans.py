@@ -0,0 +1,137 @@
+"""Precompiled read paths for list serializers.
+
+A FieldPlan is built once per serializer class from its readable fields.
+It renders values() rows straight to dicts, filling nested many=True
+serializers of many-to-many fields from one query per page, so no
+serializer or model instance is built per row. The output equals the
+serializer's to_representation() of the same objects.
+"""
+import threading
+
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Fields whose to_representation() returns database values unchanged.
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField)
+
+# Parent ids per nested query, which covers a full page of any list.
+NESTED_BATCH_SIZE = 1000
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+class UnsupportedField(Exception):
+    """A serializer field the plan can't render from values() rows."""
+
+
+class FieldPlan:
+    """Render rows for one ModelSerializer class"""
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        self.model = serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        self.columns = [self.pk]
+        # (key, column, convert or None), in serializer field order; nested
+        # keys have no column and are filled in by render().
+        self.fields = []
+        # (key, query name, child plan)
+        self.nested = []
+        for field in serializer._readable_fields:
+            self._add(field)
+
+    def _add(self, field):
+        if isinstance(field, serializers.ListSerializer):
+            child = get_plan(type(field.child))
+            model_field = self.model._meta.get_field(field.source)
+            if child is None or child.nested or not model_field.many_to_many:
+                raise UnsupportedField(field.field_name)
+            self.nested.append(
+                (field.field_name, model_field.related_query_name(), child),
+            )
+            self.fields.append((field.field_name, None, None))
+            return
+        if (isinstance(field, (serializers.BaseSerializer,
+                               serializers.RelatedField,
+                               serializers.ManyRelatedField,
+                               serializers.SerializerMethodField))
+                or field.source == '*' or '.' in field.source):
+            raise UnsupportedField(field.field_name)
+        convert = field.to_representation
+        if isinstance(field, IDENTITY_FIELDS):
+            convert = None
+        if field.source not in self.columns:
+            self.columns.append(field.source)
+        self.fields.append((field.field_name, field.source, convert))
+
+    def render_row(self, row):
+        item = {}
+        for key, column, convert in self.fields:
+            if column is None:
+                item[key] = None
+                continue
+            value = row[column]
+            if value is not None and convert is not None:
+                value = convert(value)
+            item[key] = value
+        return item
+
+    def _load_nested(self, query_name, child, ids):
+        """Return {parent pk: [rendered child]} ordered by child pk."""
+        related = {pk: [] for pk in ids}
+        for start in range(0, len(ids), NESTED_BATCH_SIZE):
+            batch = ids[start:start + NESTED_BATCH_SIZE]
+            rows = (
+                child.model.objects
+                .filter(**{f'{query_name}__in': batch})
+                .order_by(child.pk)
+                .values(query_name, *child.columns)
+            )
+            for row in rows:
+                related[row[query_name]].append(child.render_row(row))
+        return related
+
+    def render(self, rows):
+        """Render a page of values() rows with their nested objects."""
+        rows = list(rows)
+        items = [self.render_row(row) for row in rows]
+        if self.nested and rows:
+            ids = [row[self.pk] for row in rows]
+            for key, query_name, child in self.nested:
+                related = self._load_nested(query_name, child, ids)
+                for item, row in zip(items, rows):
+                    item[key] = related[row[self.pk]]
+        return items
+
+
+def get_plan(serializer_class):
+    """Return the FieldPlan of serializer_class, or None if it has none."""
+    try:
+        return _plans[serializer_class]
+    except KeyError:
+        pass
+    try:
+        plan = FieldPlan(serializer_class)
+    except UnsupportedField:
+        plan = None
+    with _plans_lock:
+        return _plans.setdefault(serializer_class, plan)
+
+
+class FastListMixin:
+    """Render list responses through the serializer's FieldPlan"""
+
+    def list(self, request, *args, **kwargs):
+        plan = get_plan(self.get_serializer_class())
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .prefetch_related(None)
+            .values(*plan.columns)
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(plan.render(queryset))
+        return self.get_paginated_response(plan.render(page))
@@ -0,0 +1,112 @@
+"""Renderers for streaming recipe exports"""
+import csv
+import json
+import re
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class Echo:
+    """File-like object handing back whatever csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+class NDJSONRenderer(BaseRenderer):
+    """One JSON document per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for error responses; exports go through stream().
+        return self.dumps(data).encode(self.charset)
+
+    def dumps(self, item):
+        return json.dumps(
+            item, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'),
+        )
+
+    def stream(self, items, fields):
+        for item in items:
+            yield self.dumps(item) + '\n'
+
+
+class CSVRenderer(BaseRenderer):
+    """Comma separated rows with a header; tag names are joined with '|'.
+
+    A '|' or '\\' inside a tag name is escaped with a backslash, so
+    split_tags() gives back the names join_tags() was given. Cells a
+    spreadsheet would run as a formula get a leading "'"; see
+    quote_formula().
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+    tag_separator = '|'
+    tag_escape = '\\'
+    # Formula-like cells, also behind quotes, so that a value already
+    # starting with "'" survives unquote_formula().
+    formula = re.compile(r"'*[=+\-@\t\r]")
+
+    @classmethod
+    def quote_formula(cls, cell):
+        """Prefix "'" to a cell a spreadsheet would evaluate."""
+        return "'" + cell if cls.formula.match(cell) else cell
+
+    @classmethod
+    def unquote_formula(cls, cell):
+        """Undo quote_formula()."""
+        if cell.startswith("'") and cls.formula.match(cell):
+            return cell[1:]
+        return cell
+
+    @classmethod
+    def join_tags(cls, names):
+        sep, esc = cls.tag_separator, cls.tag_escape
+        return sep.join(
+            name.replace(esc, esc + esc).replace(sep, esc + sep)
+            for name in names
+        )
+
+    @classmethod
+    def split_tags(cls, cell):
+        """Return the non-empty tag names of a join_tags() cell."""
+        names, name, chars = [], [], iter(cell)
+        for char in chars:
+            if char == cls.tag_escape:
+                name.append(next(chars, ''))
+            elif char == cls.tag_separator:
+                names.append(''.join(name))
+                name = []
+            else:
+                name.append(char)
+        names.append(''.join(name))
+        return [name for name in names if name]
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for error responses; exports go through stream().
+        rows = data.items() if isinstance(data, dict) else [('detail', data)]
+        return ''.join(self.stream_rows(rows)).encode(self.charset)
+
+    def stream_rows(self, rows):
+        writer = csv.writer(Echo())
+        for row in rows:
+            yield writer.writerow(row)
+
+    def stream(self, items, fields):
+        yield from self.stream_rows([fields])
+        yield from self.stream_rows(
+            [self.to_cell(item[field]) for field in fields] for item in items
+        )
+
+    def to_cell(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, list):
+            value = self.join_tags(tag['name'] for tag in value)
+        if isinstance(value, str):
+            return self.quote_formula(value)
+        return value
@@ -0,0 +1,218 @@
+"""Full-text search over recipe titles and descriptions.
+
+Each backend keeps a side index table next to core_recipe that is
+updated row by row as recipes are saved and deleted:
+
+    SQLiteFTSBackend    FTS5 virtual table, ranked with bm25()
+    PostgresSearchBackend   tsvector column with a GIN index, ranked
+                            with ts_rank_cd()
+
+The backend is picked from the database vendor, or from the dotted path
+in settings.RECIPE_SEARCH_BACKEND.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+INDEX_TABLE = 'recipe_search'
+
+# FTS5 rejects a NUL in a string even when quoted, and PostgreSQL
+# rejects it in any text; other control characters never match.
+CONTROL_CHARACTERS = re.compile(r'[\x00-\x1f\x7f]')
+
+
+class SearchBackend:
+    """Interface for the recipe search index."""
+
+    def install(self, schema_editor):
+        """Create the index and fill it from the existing recipes."""
+        raise NotImplementedError
+
+    def uninstall(self, schema_editor):
+        raise NotImplementedError
+
+    def index(self, recipes):
+        """Add or refresh the index entries for recipes."""
+        raise NotImplementedError
+
+    def remove(self, recipe_ids):
+        """Drop the index entries for recipe_ids."""
+        raise NotImplementedError
+
+    def search(self, user_id, query, limit):
+        """Return up to limit ids of user_id's recipes matching query."""
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Search backed by an SQLite FTS5 table keyed by the recipe id."""
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {INDEX_TABLE} USING fts5("
+            "title, description, user_id UNINDEXED, "
+            "tokenize='porter unicode61')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {INDEX_TABLE} (rowid, title, description, user_id) "
+            "SELECT id, title, COALESCE(description, ''), user_id "
+            "FROM core_recipe"
+        )
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {INDEX_TABLE}')
+
+    def index(self, recipes):
+        recipes = list(recipes)
+        if not recipes:
+            return
+        with connection.cursor() as cursor:
+            self._delete(cursor, [recipe.id for recipe in recipes])
+            cursor.executemany(
+                f'INSERT INTO {INDEX_TABLE} '
+                '(rowid, title, description, user_id) VALUES (%s, %s, %s, %s)',
+                [(recipe.id, recipe.title, recipe.description or '',
+                  recipe.user_id) for recipe in recipes],
+            )
+
+    def remove(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if recipe_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, recipe_ids)
+
+    def _delete(self, cursor, recipe_ids):
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        cursor.execute(
+            f'DELETE FROM {INDEX_TABLE} WHERE rowid IN ({placeholders})',
+            recipe_ids,
+        )
+
+    @staticmethod
+    def to_match_expression(query):
+        """Quote every term so user input can't inject FTS5 syntax."""
+        terms = (CONTROL_CHARACTERS.sub('', term) for term in query.split())
+        return ' '.join(
+            '"%s"' % term.replace('"', '""') for term in terms if term
+        )
+
+    def search(self, user_id, query, limit):
+        expression = self.to_match_expression(query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            # Title matches weigh ten times as much as description ones.
+            cursor.execute(
+                f'SELECT rowid FROM {INDEX_TABLE} '
+                f'WHERE {INDEX_TABLE} MATCH %s AND user_id = %s '
+                f'ORDER BY bm25({INDEX_TABLE}, 10.0, 1.0) LIMIT %s',
+                [expression, user_id, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Search backed by a weighted tsvector table with a GIN index."""
+    config = 'english'
+
+    def _document_sql(self):
+        return (
+            f"setweight(to_tsvector('{self.config}', "
+            "COALESCE(title, '')), 'A') || "
+            f"setweight(to_tsvector('{self.config}', "
+            "COALESCE(description, '')), 'B')"
+        )
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            f'CREATE TABLE {INDEX_TABLE} ('
+            'recipe_id bigint PRIMARY KEY '
+            'REFERENCES core_recipe (id) ON DELETE CASCADE, '
+            'user_id bigint NOT NULL, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {INDEX_TABLE}_document_idx '
+            f'ON {INDEX_TABLE} USING GIN (document)'
+        )
+        schema_editor.execute(
+            f'INSERT INTO {INDEX_TABLE} (recipe_id, user_id, document) '
+            f'SELECT id, user_id, {self._document_sql()} FROM core_recipe'
+        )
+
+    def uninstall(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {INDEX_TABLE}')
+
+    def index(self, recipes):
+        recipe_ids = [recipe.id for recipe in recipes]
+        if not recipe_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {INDEX_TABLE} (recipe_id, user_id, document) '
+                f'SELECT id, user_id, {self._document_sql()} FROM core_recipe '
+                'WHERE id = ANY(%s) '
+                'ON CONFLICT (recipe_id) DO UPDATE '
+                'SET user_id = EXCLUDED.user_id, document = EXCLUDED.document',
+                [recipe_ids],
+            )
+
+    def remove(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if recipe_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {INDEX_TABLE} WHERE recipe_id = ANY(%s)',
+                    [recipe_ids],
+                )
+
+    def search(self, user_id, query, limit):
+        query = CONTROL_CHARACTERS.sub(' ', query)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT recipe_id FROM {INDEX_TABLE}, '
+                f"websearch_to_tsquery('{self.config}', %s) query "
+                'WHERE user_id = %s AND document @@ query '
+                'ORDER BY ts_rank_cd(document, query) DESC, recipe_id DESC '
+                'LIMIT %s',
+                [query, user_id, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class NullSearchBackend(SearchBackend):
+    """Backend for databases without a supported full-text index."""
+
+    def install(self, schema_editor):
+        pass
+
+    def uninstall(self, schema_editor):
+        pass
+
+    def index(self, recipes):
+        pass
+
+    def remove(self, recipe_ids):
+        pass
+
+    def search(self, user_id, query, limit):
+        return []
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTSBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(vendor=None):
+    """Return the search backend for the configured database."""
+    path = getattr(settings, 'RECIPE_SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    backend_class = VENDOR_BACKENDS.get(
+        vendor or connection.vendor, NullSearchBackend,
+    )
+    return backend_class()
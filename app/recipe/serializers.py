@@ -2,9 +2,16 @@ from core.models import (
     Recipe,
     Tag)
 from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
 
 from rest_framework import serializers
 from user.serializers import UserSerializer 
+from recipe.cache import invalidate
+from recipe.search import get_backend
+from recipe.tags import resolve_tags, link_tags, sync_tags
+
+BULK_BATCH_SIZE = 500
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,25 +25,117 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
         read_only_fields = ['id']
 
+
+def _insert_recipes(recipes):
+    """Insert recipes and set their primary keys"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes, batch_size=BULK_BATCH_SIZE)
+        # bulk_create sends no post_save, so index the rows here.
+        get_backend().index(recipes)
+    else:
+        for recipe in recipes:
+            recipe.save(force_insert=True)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Create or update many recipes with a fixed number of queries"""
+
+    def _tag_names(self, validated_data):
+        """Pop the nested tags of every item, keyed by item position"""
+        return {
+            index: [tag['name'] for tag in attrs.pop('tags')]
+            for index, attrs in enumerate(validated_data)
+            if 'tags' in attrs
+        }
+
+    def create(self, validated_data):
+        auth_user = self.context['request'].user
+        tag_names = self._tag_names(validated_data)
+        with transaction.atomic():
+            recipes = [Recipe(**attrs) for attrs in validated_data]
+            _insert_recipes(recipes)
+            tag_map = resolve_tags(
+                auth_user,
+                [name for names in tag_names.values() for name in names],
+            )
+            link_tags(
+                (recipes[index].id, tag_map[name].id)
+                for index, names in tag_names.items()
+                for name in names
+            )
+            # bulk_create and the tag links send no model signals.
+            invalidate(auth_user.id)
+        return recipes
+
+    def update(self, instances, validated_data):
+        """Update instances with the validated item at the same position"""
+        auth_user = self.context['request'].user
+        tag_names = self._tag_names(validated_data)
+        # bulk_update skips auto_now, so stamp updated_at by hand.
+        now = timezone.now()
+        fields = {'updated_at'}
+        for recipe, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(recipe, attr, value)
+            recipe.updated_at = now
+            fields.update(attrs)
+        with transaction.atomic():
+            Recipe.objects.bulk_update(
+                instances, fields, batch_size=BULK_BATCH_SIZE,
+            )
+            if fields & {'title', 'description'}:
+                get_backend().index(instances)
+            tag_map = resolve_tags(
+                auth_user,
+                [name for names in tag_names.values() for name in names],
+            )
+            sync_tags({
+                instances[index].id: {tag_map[name].id for name in names}
+                for index, names in tag_names.items()
+            })
+            # Nor does bulk_update.
+            invalidate(auth_user.id)
+        return instances
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True, required=False)
     class Meta:
         model = Recipe
         fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags']
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
+
+    def _assign_tags(self, recipe, tags):
+        """Attach tags to a new recipe, creating the missing ones"""
+        auth_user = self.context['request'].user
+        tag_map = resolve_tags(auth_user, [tag['name'] for tag in tags])
+        link_tags((recipe.id, tag.id) for tag in tag_map.values())
 
     def create(self,validated_data):
         """Create a recipe"""
         tags = validated_data.pop('tags', [])
-        recipe = Recipe.objects.create(**validated_data)
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            recipe.tags.add(tag_obj)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data)
+            self._assign_tags(recipe, tags)
         return recipe
+
+    def _sync_tags(self, recipe, tags):
+        """Make the recipe's tags match the submitted ones"""
+        auth_user = self.context['request'].user
+        tag_map = resolve_tags(auth_user, [tag['name'] for tag in tags])
+        sync_tags({recipe.id: {tag.id for tag in tag_map.values()}})
+
+    def update(self, instance, validated_data):
+        """Update a recipe"""
+        tags = validated_data.pop('tags', None)
+        with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            if tags is not None:
+                self._sync_tags(instance, tags)
+        return instance
     
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -0,0 +1,58 @@
+"""Signal handlers keeping recipe side indexes up to date"""
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Tombstone
+from recipe.cache import bump_version, invalidate
+from recipe.search import get_backend
+
+SEARCHED_FIELDS = {'title', 'description'}
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    """Refresh the search entry of a saved recipe."""
+    if update_fields is not None and not SEARCHED_FIELDS & set(update_fields):
+        return
+    get_backend().index([instance])
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    """Drop the search entry of a deleted recipe."""
+    get_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_owner_cache(sender, instance, **kwargs):
+    """Drop the owner's cached responses when a recipe or tag changes."""
+    invalidate(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_tag_links_cache(sender, instance, action, **kwargs):
+    """Drop the owner's cached responses when recipe tags change."""
+    if action.startswith('post_'):
+        invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reset_new_user_cache(sender, instance, created, **kwargs):
+    """Start new users on a fresh version in case their id was reused."""
+    if created:
+        bump_version(instance.id)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+def record_tombstone(sender, instance, **kwargs):
+    """Remember deleted recipes and tags for incremental sync."""
+    Tombstone.objects.create(
+        user_id=instance.user_id,
+        kind=Tombstone.RECIPE if sender is Recipe else Tombstone.TAG,
+        object_id=instance.pk,
+    )
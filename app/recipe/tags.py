@@ -0,0 +1,67 @@
+"""Batched tag resolution for recipes"""
+from core.models import Recipe, Tag
+
+
+def resolve_tags(user, names):
+    """Return a {name: Tag} map for names, creating any missing tags.
+
+    Costs at most three queries no matter how many names are passed.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    tags = {
+        tag.name: tag
+        for tag in Tag.objects.filter(user=user, name__in=names)
+    }
+    missing = [name for name in names if name not in tags]
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        # Not every backend returns primary keys from a bulk insert, and a
+        # concurrent request may have created some of the tags, so read
+        # them back.
+        tags.update(
+            (tag.name, tag)
+            for tag in Tag.objects.filter(user=user, name__in=missing)
+        )
+    return tags
+
+
+def link_tags(links):
+    """Insert (recipe_id, tag_id) pairs into the recipe/tag table at once."""
+    through = Recipe.tags.through
+    through.objects.bulk_create(
+        [through(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id, tag_id in links],
+        ignore_conflicts=True,
+    )
+
+
+def sync_tags(wanted):
+    """Make the tag links of each recipe match wanted.
+
+    wanted maps recipe ids to the tag ids they should carry. Only the
+    links that changed are deleted or inserted, in one query each.
+    """
+    through = Recipe.tags.through
+    current = through.objects.filter(recipe_id__in=list(wanted)).values_list(
+        'id', 'recipe_id', 'tag_id'
+    )
+    kept = set()
+    stale = []
+    for link_id, recipe_id, tag_id in current:
+        if tag_id in wanted[recipe_id]:
+            kept.add((recipe_id, tag_id))
+        else:
+            stale.append(link_id)
+    if stale:
+        through.objects.filter(id__in=stale).delete()
+    link_tags(
+        (recipe_id, tag_id)
+        for recipe_id, tag_ids in wanted.items()
+        for tag_id in tag_ids
+        if (recipe_id, tag_id) not in kept
+    )
@@ -0,0 +1,135 @@
+"""
+Tests for the recipe/tag response cache.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import CacheVersion, Recipe, Tag
+from recipe import cache
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ResponseCacheTests(TransactionTestCase):
+    """Test cached GET responses and their invalidation."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="test@123"
+        )
+        self.client.force_authenticate(self.user)
+        cache.reset_stats()
+
+    def test_repeated_list_is_served_from_cache(self):
+        """Test the second identical list request is a cache hit"""
+        Recipe.objects.create(user=self.user, title="Soup")
+        first = self.client.get(RECIPES_URL)
+        # Only the cache version is read.
+        with self.assertNumQueries(1):
+            second = self.client.get(RECIPES_URL)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get(RECIPES_URL)
+        res = self.client.get(RECIPES_URL, {'title': 'So'})
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_scheme_is_part_of_the_key(self):
+        """Test links cached over http aren't served to https clients"""
+        for pk in range(3):
+            Recipe.objects.create(user=self.user, title=f"Soup {pk}")
+        self.client.get(RECIPES_URL, {'page_size': 2})
+        res = self.client.get(RECIPES_URL, {'page_size': 2}, secure=True)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertTrue(res.data['next'].startswith('https://'))
+
+    def test_cache_is_per_user(self):
+        """Test one user's cached list is never served to another"""
+        Recipe.objects.create(user=self.user, title="Soup")
+        self.client.get(RECIPES_URL)
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="test@123"
+        )
+        self.client.force_authenticate(other)
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(res.data['results'], [])
+
+    def test_writes_invalidate_cache(self):
+        """Test API and ORM writes invalidate the cached responses"""
+        recipe = Recipe.objects.create(user=self.user, title="Soup")
+        tag = Tag.objects.create(user=self.user, name="Hot")
+        writes = [
+            lambda: self.client.post(RECIPES_URL, {'title': 'Stew'}),
+            lambda: self.client.patch(
+                detail_url(recipe.id), {'title': 'Broth'},
+            ),
+            lambda: recipe.tags.add(tag),
+            lambda: Tag.objects.filter(id=tag.id).first().save(),
+            lambda: self.client.post(
+                BULK_URL, [{'title': 'Bulk'}], format='json',
+            ),
+            lambda: self.client.delete(detail_url(recipe.id)),
+        ]
+        for write in writes:
+            self.client.get(RECIPES_URL)
+            self.client.get(TAGS_URL)
+            write()
+            self.assertEqual(self.client.get(RECIPES_URL)['X-Cache'], 'MISS')
+            self.assertEqual(self.client.get(TAGS_URL)['X-Cache'], 'MISS')
+
+    def test_detail_reflects_tag_rename(self):
+        """Test renaming a tag refreshes cached recipe details"""
+        recipe = Recipe.objects.create(user=self.user, title="Soup")
+        tag = Tag.objects.create(user=self.user, name="Hot")
+        recipe.tags.add(tag)
+        self.client.get(detail_url(recipe.id))
+        res = self.client.patch(
+            reverse('recipe:tag-detail', args=[tag.id]), {'name': 'Cold'},
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(detail_url(recipe.id))
+        self.assertEqual(res.data['tags'][0]['name'], 'Cold')
+
+    def test_bulk_write_bumps_once(self):
+        """Test a bulk write updates the version row once"""
+        items = [
+            {'title': f'Bulk {i}', 'tags': [{'name': 'Hot'}]} for i in range(5)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(BULK_URL, items, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        bumps = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+            and 'core_cacheversion' in query['sql']
+        ]
+        self.assertEqual(len(bumps), 1)
+
+    def test_rolled_back_write_keeps_version(self):
+        version = cache.get_version(self.user.id)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Recipe.objects.create(user=self.user, title="Soup")
+            raise RuntimeError()
+        self.assertEqual(cache.get_version(self.user.id), version)
+        Recipe.objects.create(user=self.user, title="Stew")
+        self.assertEqual(
+            CacheVersion.objects.get(user_id=self.user.id).version,
+            version + 1,
+        )
@@ -0,0 +1,50 @@
+"""
+Tests for the recipe management commands.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Recipe
+from recipe.management.commands.explain_queries import FULL_SCAN_PATTERNS
+
+
+class ExplainQueriesCommandTests(TestCase):
+    """Test the explain_queries command."""
+
+    def test_hot_queries_use_indexes(self):
+        """Test none of the hot queries fall back to a full scan"""
+        out = StringIO()
+        call_command('explain_queries', '--strict', stdout=out)
+        self.assertNotIn('FULL SCAN', out.getvalue())
+
+    def test_sqlite_full_scan_detected(self):
+        """Test a table scan in an SQLite plan is reported"""
+        pattern = FULL_SCAN_PATTERNS['sqlite']
+        self.assertEqual(
+            pattern.findall('2 0 0 SCAN core_recipe'), ['core_recipe'],
+        )
+        self.assertEqual(
+            pattern.findall(
+                '2 0 0 SCAN core_tag USING INDEX tag_user_name_idx',
+            ),
+            [],
+        )
+
+
+class BenchmarkSerializersCommandTests(TestCase):
+    """Test the benchmark_serializers command."""
+
+    def test_reports_identical_output(self):
+        out = StringIO()
+        call_command(
+            'benchmark_serializers', '--rows', '3,20', '--repeat', '1',
+            stdout=out,
+        )
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(
+            all(line.endswith('identical JSON: True') for line in lines),
+        )
+        self.assertFalse(Recipe.objects.exists())
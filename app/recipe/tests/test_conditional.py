@@ -0,0 +1,88 @@
+"""
+Tests for conditional GET on the recipe endpoints.
+"""
+from django.contrib.auth import get_user_model
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import CacheVersion, Recipe
+from recipe import cache
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+class ConditionalGetTests(TransactionTestCase):
+    """Test ETag and Last-Modified handling."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="test@123"
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(user=self.user, title="Soup")
+
+    def test_if_none_match_returns_not_modified(self):
+        """Test a matching ETag gets a 304 from the version row alone"""
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+
+    def test_write_changes_etag(self):
+        """Test a write makes the previous ETag stale"""
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+        self.client.patch(detail_url(self.recipe.id), {'title': 'Stew'})
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'Stew')
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_if_modified_since_returns_not_modified(self):
+        res = self.client.get(detail_url(self.recipe.id))
+        last_modified = res['Last-Modified']
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_last_modified_starts_from_updated_at(self):
+        """Test a missing version row is dated by the newest updated_at"""
+        CacheVersion.objects.filter(user_id=self.user.id).delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            cache.get_last_modified(self.user.id),
+            int(self.recipe.updated_at.timestamp())
+        )
+
+    def test_validators_survive_an_empty_cache(self):
+        """Test a worker with an empty cache agrees on the validators"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+        cache.get_cache().clear()
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Recipe.objects.create(user=self.user, title="Stew")
+        cache.get_cache().clear()
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_missing_recipe_has_no_validators(self):
+        res = self.client.get(detail_url(self.recipe.id + 1))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('ETag', res)
@@ -0,0 +1,109 @@
+"""
+Tests for the precompiled list serializer plans.
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.plans import get_plan
+from recipe.serializers import (
+    RecipeDetailSerializer, RecipeSerializer, TagSerializer,
+)
+from recipe.views import tags_prefetch
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class FieldPlanTests(TestCase):
+    """Test plans render exactly what the serializers render."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com', password='test@123',
+        )
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('b', 'a', 'ü')
+        ]
+        full = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=5,
+            price=Decimal('5.5'),
+            link='curry.pdf', description='Spicy',
+        )
+        full.tags.set([tags[2], tags[0]])
+        Recipe.objects.create(
+            user=self.user, title='Bare', time_minutes=None, price=None,
+        )
+        Recipe.objects.create(
+            user=self.user, title='Cheap', price=Decimal('0.10'),
+        )
+
+    def assert_same_output(self, serializer_class, queryset):
+        plan = get_plan(serializer_class)
+        self.assertIsNotNone(plan)
+        instances = queryset
+        if queryset.model is Recipe:
+            instances = queryset.prefetch_related(tags_prefetch())
+        expected = serializer_class(instances, many=True).data
+        actual = plan.render(queryset.values(*plan.columns))
+        self.assertEqual(render(actual), render(expected))
+
+    def test_recipe_serializer(self):
+        self.assert_same_output(
+            RecipeSerializer, Recipe.objects.order_by('-id'),
+        )
+
+    def test_recipe_detail_serializer(self):
+        self.assert_same_output(
+            RecipeDetailSerializer, Recipe.objects.order_by('id'),
+        )
+
+    def test_tag_serializer(self):
+        self.assert_same_output(
+            TagSerializer, Tag.objects.order_by('-name', 'id'),
+        )
+
+    def test_nested_loaded_in_one_query(self):
+        plan = get_plan(RecipeSerializer)
+        rows = list(Recipe.objects.values(*plan.columns))
+        with self.assertNumQueries(1):
+            plan.render(rows)
+
+    def test_unsupported_serializer_has_no_plan(self):
+        class MethodSerializer(serializers.ModelSerializer):
+            upper = serializers.SerializerMethodField()
+
+            class Meta:
+                model = Tag
+                fields = ['id', 'upper']
+
+            def get_upper(self, obj):
+                return obj.name.upper()
+
+        self.assertIsNone(get_plan(MethodSerializer))
+
+    def test_list_endpoints_match_serializers(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        res = client.get(RECIPES_URL)
+        expected = RecipeSerializer(
+            Recipe.objects.order_by('-id').prefetch_related(tags_prefetch()),
+            many=True,
+        ).data
+        self.assertEqual(render(res.data['results']), render(expected))
+        res = client.get(TAGS_URL)
+        expected = TagSerializer(
+            Tag.objects.order_by('-name', 'id'), many=True,
+        ).data
+        self.assertEqual(render(res.data['results']), render(expected))
@@ -1,13 +1,25 @@
+from unittest.mock import patch
 from django.test import TestCase
 from rest_framework.test import APIClient
 from core.models import Recipe, Tag
 from decimal import Decimal
+import csv
+import io
+import json
 from rest_framework import status
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from recipe.views import RecipeCursorPagination
 
 RECIPES_URL = reverse('recipe:recipe-list')
+SEARCH_URL = reverse('recipe:recipe-search')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
+IMPORT_URL = reverse('recipe:recipe-import-recipes')
 
 def detail_url(recipe_id):
     return reverse('recipe:recipe-detail', args=[recipe_id])
@@ -58,7 +70,7 @@ class PrivateRecipeAPITests(TestCase):
         recipes =Recipe.objects.all().order_by('-id')
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_list_to_limited_user(self):
         """Testing authenticated users sorted recipes to all recipes"""
@@ -73,7 +85,42 @@ class PrivateRecipeAPITests(TestCase):
         data = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(data, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
+
+    def test_list_recipes_query_count(self):
+        """Test listing recipes costs a fixed number of queries"""
+        for i in range(5):
+            recipe = create_recipe(user=self.user, title=f"Recipe {i}")
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f"Tag {i}"),
+                Tag.objects.create(user=self.user, name=f"Other {i}"),
+            )
+        # The cache version, the page and the page's tags.
+        with self.assertNumQueries(3):
+            res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_list_recipes_paginated(self):
+        """Test recipes are listed in pages following the next cursor"""
+        recipes = [create_recipe(user=self.user) for _ in range(5)]
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [item['id'] for item in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            ids.extend(item['id'] for item in res.data['results'])
+        self.assertEqual(ids, [recipe.id for recipe in reversed(recipes)])
+
+    def test_list_recipes_page_size_capped(self):
+        """Test the requested page size is capped by the server"""
+        for _ in range(3):
+            create_recipe(user=self.user)
+        with patch.object(RecipeCursorPagination, 'max_page_size', 2):
+            res = self.client.get(RECIPES_URL, {'page_size': 10})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
 
     def test_get_recipe_details(self):
         recipe = create_recipe(user=self.user)
@@ -215,6 +262,23 @@ class PrivateRecipeAPITests(TestCase):
         breakfast_tag = Tag.objects.get(name="Breakfast", user=self.user)
         self.assertIn(breakfast_tag, recipe.tags.all())
 
+    def test_create_recipe_tag_queries_do_not_grow(self):
+        """Test creating a recipe costs the same queries for 2 or 30 tags"""
+        Tag.objects.create(name="Existing", user=self.user)
+        counts = []
+        for size in (2, 30):
+            payload = {
+                "title": "Tagged",
+                "tags": [{"name": "Existing"}] + [
+                    {"name": f"Tag {size}-{i}"} for i in range(size - 1)
+                ]
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.post(RECIPES_URL, payload, format="json")
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['tags']), size)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
     
     def create_test_tag_on_update(self):
         """Test creating a tag while updating a recipe"""
@@ -242,5 +306,421 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(tag_lunch, recipe.tags.all())
         self.assertNotIn(tag_breakfast, recipe.tags.all())
 
+    def test_update_recipe_keeps_unchanged_tag_links(self):
+        """Test updating tags only touches the links that changed"""
+        tag_breakfast = Tag.objects.create(user=self.user, name="breakfast")
+        tag_dinner = Tag.objects.create(user=self.user, name="dinner")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag_breakfast, tag_dinner)
+        through = Recipe.tags.through
+        kept_link = through.objects.get(recipe=recipe, tag=tag_breakfast)
+        payload = {
+            "tags": [{"name": "breakfast"}, {"name": "lunch"}]
+        }
+        res = self.client.patch(detail_url(recipe.id), payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(tag.name for tag in recipe.tags.all()),
+            ["breakfast", "lunch"]
+        )
+        self.assertTrue(through.objects.filter(id=kept_link.id).exists())
+
+    def test_clear_recipe_tags(self):
+        """Test an empty tag list removes every tag from a recipe"""
+        tag = Tag.objects.create(user=self.user, name="breakfast")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag)
+        res = self.client.patch(
+            detail_url(recipe.id), {"tags": []}, format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(recipe.tags.count(), 0)
+
+    def test_filter_by_tags(self):
+        """Test filtering recipes by any or all of the given tags"""
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        quick = Tag.objects.create(user=self.user, name="Quick")
+        both = create_recipe(user=self.user, title="Both")
+        both.tags.add(vegan, quick)
+        only_vegan = create_recipe(user=self.user, title="Vegan only")
+        only_vegan.tags.add(vegan)
+        create_recipe(user=self.user, title="Untagged")
+        tags = f"{vegan.id},{quick.id}"
+
+        res = self.client.get(RECIPES_URL, {'tags': tags})
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [only_vegan.id, both.id])
+
+        res = self.client.get(RECIPES_URL, {'tags': tags, 'tags_match': 'all'})
+        ids = [item['id'] for item in res.data['results']]
+        self.assertEqual(ids, [both.id])
+
+    def test_filter_by_time_price_and_title(self):
+        """Test filtering recipes by time, price range and title prefix"""
+        match = create_recipe(
+            user=self.user, title="Pancakes", time_minutes=10,
+            price=Decimal('4.00'),
+        )
+        create_recipe(user=self.user, title="Pancakes deluxe", time_minutes=40)
+        create_recipe(
+            user=self.user, title="Pancakes gold", price=Decimal('9.00'),
+        )
+        create_recipe(user=self.user, title="Waffles", time_minutes=5)
+        params = {
+            'max_time_minutes': 20,
+            'price_min': '3',
+            'price_max': '5',
+            'title': 'Pan',
+        }
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']], [match.id],
+        )
 
+    def test_filter_invalid_params_error(self):
+        """Test malformed filter values return a 400"""
+        for params in ({'tags': '1,x'}, {'max_time_minutes': 'soon'},
+                       {'price_max': 'cheap'},
+                       {'tags': '1', 'tags_match': 'some'},
+                       {'max_time_minutes': '99999999999999999999999'},
+                       {'tags': '99999999999999999999999'}):
+            res = self.client.get(RECIPES_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_price_outside_column_rejected(self):
+        """Test prices the price column can't hold return a 400"""
+        create_recipe(user=self.user, title="Soup", price=Decimal('5.00'))
+        for value in (
+            'NaN', 'sNaN', 'Infinity', '-Infinity', '1e10', '1000', '1.005'
+        ):
+            for name in ('price_min', 'price_max'):
+                res = self.client.get(RECIPES_URL, {name: value})
+                self.assertEqual(
+                    res.status_code, status.HTTP_400_BAD_REQUEST,
+                    (name, value),
+                )
+                self.assertIn(name, res.data)
+
+    def test_filter_title_prefix_beyond_bmp(self):
+        """Test the title prefix matches characters above U+FFFF"""
+        emoji = create_recipe(user=self.user, title='ab\U0001F600')
+        abc = create_recipe(user=self.user, title='abc')
+        create_recipe(user=self.user, title='Ab')
+        create_recipe(user=self.user, title='ac')
+        res = self.client.get(RECIPES_URL, {'title': 'ab'})
+        self.assertEqual(
+            sorted(item['id'] for item in res.data['results']),
+            sorted([emoji.id, abc.id]),
+        )
+
+    def test_filter_title_prefix_of_last_code_point(self):
+        """Test a prefix ending in U+10FFFF still matches"""
+        match = create_recipe(user=self.user, title='a\U0010FFFFz')
+        create_recipe(user=self.user, title='b')
+        res = self.client.get(RECIPES_URL, {'title': 'a\U0010FFFF'})
+        self.assertEqual(
+            [item['id'] for item in res.data['results']], [match.id],
+        )
+
+    def test_search_recipes(self):
+        """Test searching recipes ranks title matches first"""
+        in_title = create_recipe(
+            user=self.user, title="Garlic bread", description="Crusty"
+        )
+        in_description = create_recipe(
+            user=self.user, title="Pasta", description="Lots of garlic"
+        )
+        create_recipe(user=self.user, title="Pancakes", description="Sweet")
+        other_user = create_user(
+            email="other@example.com", password="test@123",
+        )
+        create_recipe(user=other_user, title="Garlic soup")
+
+        res = self.client.get(SEARCH_URL, {'q': 'garlic'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data], [in_title.id, in_description.id]
+        )
+
+    def test_search_index_follows_updates_and_deletes(self):
+        """Test the search index is kept in sync on save and delete"""
+        recipe = create_recipe(user=self.user, title="Lemon tart")
+        res = self.client.patch(detail_url(recipe.id), {'title': 'Lime tart'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(SEARCH_URL, {'q': 'lemon'}).data, [])
+        self.assertEqual(
+            len(self.client.get(SEARCH_URL, {'q': 'lime'}).data), 1,
+        )
+
+        self.client.delete(detail_url(recipe.id))
+        self.assertEqual(self.client.get(SEARCH_URL, {'q': 'lime'}).data, [])
+
+    def test_search_requires_query(self):
+        res = self.client.get(SEARCH_URL, {'q': ' '})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_query_syntax_is_escaped(self):
+        """Test search operators in the query are matched literally"""
+        create_recipe(user=self.user, title="Garlic bread")
+        res = self.client.get(SEARCH_URL, {'q': 'garlic" OR (*'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+
+    def test_search_query_control_characters_ignored(self):
+        """Test NUL and other control characters don't break the search"""
+        create_recipe(user=self.user, title="Garlic bread")
+        res = self.client.get(SEARCH_URL, {'q': '\x00'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [])
+        res = self.client.get(SEARCH_URL, {'q': 'gar\x00lic\x1b'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_bulk_create_recipes(self):
+        """Test creating a list of recipes with shared tags"""
+        Tag.objects.create(user=self.user, name="Existing")
+        payload = [
+            {"title": f"Recipe {i}", "price": "1.50",
+             "tags": [{"name": "Existing"}, {"name": f"New {i % 2}"}]}
+            for i in range(4)
+        ]
+        res = self.client.post(BULK_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        results = res.data['results']
+        self.assertEqual([item['status'] for item in results], ['created'] * 4)
+        for index, item in enumerate(results):
+            recipe = Recipe.objects.get(id=item['id'], user=self.user)
+            self.assertEqual(recipe.title, f"Recipe {index}")
+            self.assertEqual(
+                sorted(tag.name for tag in recipe.tags.all()),
+                ["Existing", f"New {index % 2}"]
+            )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            len(self.client.get(SEARCH_URL, {'q': 'recipe'}).data), 4,
+        )
 
+    def test_bulk_create_invalid_item_rejects_batch(self):
+        """Test one invalid item rejects the batch with per-item status"""
+        payload = [{"title": "Fine"}, {"title": "Bad", "time_minutes": "soon"}]
+        res = self.client.post(BULK_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        results = res.data['results']
+        self.assertEqual(results[0]['status'], 'skipped')
+        self.assertEqual(results[1]['status'], 'invalid')
+        self.assertIn('time_minutes', results[1]['errors'])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_size_limit(self):
+        """Test batches above RECIPE_BULK_MAX_ITEMS are rejected"""
+        with self.settings(RECIPE_BULK_MAX_ITEMS=2):
+            res = self.client.post(
+                BULK_URL, [{"title": "x"}] * 3, format="json",
+            )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update_recipes(self):
+        """Test updating a list of recipes and their tags"""
+        tag = Tag.objects.create(user=self.user, name="Old")
+        first = create_recipe(user=self.user, title="First")
+        first.tags.add(tag)
+        second = create_recipe(user=self.user, title="Second")
+        payload = [
+            {"id": first.id, "tags": [{"name": "New"}]},
+            {"id": second.id, "title": "Second updated"},
+        ]
+        res = self.client.patch(BULK_URL, payload, format="json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.title, "First")
+        self.assertEqual([t.name for t in first.tags.all()], ["New"])
+        self.assertEqual(second.title, "Second updated")
+
+    def test_bulk_update_other_users_recipe_error(self):
+        """Test bulk updates cannot reach another user's recipes"""
+        other_user = create_user(
+            email="other@example.com", password="test@123",
+        )
+        recipe = create_recipe(user=other_user, title="Theirs")
+        res = self.client.patch(
+            BULK_URL, [{"id": recipe.id, "title": "Mine"}], format="json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "Theirs")
+
+    def test_bulk_delete_recipes(self):
+        """Test deleting a list of recipes reports each item"""
+        recipe = create_recipe(user=self.user)
+        other_user = create_user(
+            email="other@example.com", password="test@123",
+        )
+        other_recipe = create_recipe(user=other_user)
+        res = self.client.delete(
+            BULK_URL, [recipe.id, other_recipe.id], format="json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['status'] for item in res.data['results']],
+            ['deleted', 'not_found'],
+        )
+        self.assertFalse(Recipe.objects.filter(id=recipe.id).exists())
+        self.assertTrue(Recipe.objects.filter(id=other_recipe.id).exists())
+
+    def test_export_recipes_ndjson(self):
+        """Test exporting recipes streams one JSON document per line"""
+        tag = Tag.objects.create(user=self.user, name="Vegan")
+        recipes = [
+            create_recipe(user=self.user, title=f"Recipe {i}")
+            for i in range(3)
+        ]
+        recipes[0].tags.add(tag)
+        other_user = create_user(
+            email="other@example.com", password="test@123",
+        )
+        create_recipe(user=other_user)
+
+        with patch('recipe.views.RecipeViewSet.export_chunk_size', 2):
+            res = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertTrue(res.streaming)
+            lines = b''.join(res.streaming_content).decode().splitlines()
+        rows = [json.loads(line) for line in lines]
+        expected = RecipeDetailSerializer(reversed(recipes), many=True).data
+        self.assertEqual(rows, json.loads(json.dumps(expected)))
+
+    def test_export_recipes_csv(self):
+        """Test exporting recipes as CSV with tag names joined by |"""
+        recipe = create_recipe(user=self.user, title="Curry")
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name="Spicy"),
+            Tag.objects.create(user=self.user, name="Dinner"),
+        )
+        res = self.client.get(EXPORT_URL, {'format': 'csv'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res['Content-Type'].startswith('text/csv'))
+        content = b''.join(res.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], "Curry")
+        self.assertEqual(rows[0]['price'], "5.50")
+        self.assertEqual(
+            sorted(rows[0]['tags'].split('|')), ["Dinner", "Spicy"],
+        )
+
+    def test_import_recipes_ndjson(self):
+        """Test importing NDJSON in batches, reporting rejected lines"""
+        Tag.objects.create(user=self.user, name="Vegan")
+        lines = [
+            json.dumps({"title": f"Recipe {i}", "tags": [{"name": "Vegan"}]})
+            for i in range(5)
+        ]
+        lines.insert(2, '{"title": "Bad", "price": "free"}')
+        lines.insert(4, 'not json')
+        upload = SimpleUploadedFile(
+            "recipes.ndjson", "\n".join(lines).encode(), "application/x-ndjson"
+        )
+        with patch('recipe.views.RecipeViewSet.import_batch_size', 2):
+            res = self.client.post(
+                IMPORT_URL, {'file': upload}, format='multipart',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['imported'], 5)
+        self.assertEqual(res.data['rejected'], 2)
+        self.assertEqual([r['line'] for r in res.data['rejections']], [3, 5])
+        self.assertIn('price', res.data['rejections'][0]['errors'])
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        for recipe in recipes:
+            self.assertEqual(
+                [tag.name for tag in recipe.tags.all()], ["Vegan"],
+            )
+
+    def test_export_import_csv_round_trip(self):
+        """Test a CSV export can be imported back"""
+        recipe = create_recipe(user=self.user, title="Curry", link=None)
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Spicy"))
+        content = b''.join(
+            self.client.get(EXPORT_URL, {'format': 'csv'}).streaming_content,
+        )
+        Recipe.objects.all().delete()
+
+        upload = SimpleUploadedFile("recipes.csv", content, "text/csv")
+        res = self.client.post(
+            IMPORT_URL, {'file': upload}, format='multipart',
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['imported'], 1)
+        imported = Recipe.objects.get(user=self.user)
+        for field in ('title', 'description', 'time_minutes', 'price', 'link'):
+            self.assertEqual(getattr(imported, field), getattr(recipe, field))
+        self.assertEqual([tag.name for tag in imported.tags.all()], ["Spicy"])
+
+    def test_csv_round_trip_keeps_separator_in_tag_names(self):
+        """Test tag names containing | or \\ survive a CSV round trip"""
+        recipe = create_recipe(user=self.user, title="Curry")
+        names = ["Salt|Pepper", "Back\\slash", "Plain"]
+        recipe.tags.add(
+            *(Tag.objects.create(user=self.user, name=name) for name in names),
+        )
+        content = b''.join(
+            self.client.get(EXPORT_URL, {'format': 'csv'}).streaming_content,
+        )
+        Recipe.objects.all().delete()
+
+        upload = SimpleUploadedFile("recipes.csv", content, "text/csv")
+        res = self.client.post(
+            IMPORT_URL, {'file': upload}, format='multipart',
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        imported = Recipe.objects.get(user=self.user)
+        self.assertEqual(
+            sorted(tag.name for tag in imported.tags.all()), sorted(names),
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 3)
+
+    def test_csv_export_quotes_formulas(self):
+        """Test cells a spreadsheet would evaluate are exported quoted"""
+        titles = ["=cmd|x", "+1", "-2", "@SUM(A1)", "'=quoted", "Plain"]
+        for title in titles:
+            recipe = create_recipe(user=self.user, title=title)
+        recipe.tags.add(
+            Tag.objects.create(user=self.user, name="=HYPERLINK()"),
+        )
+        content = b''.join(
+            self.client.get(EXPORT_URL, {'format': 'csv'}).streaming_content,
+        )
+        rows = list(csv.DictReader(io.StringIO(content.decode())))
+        self.assertEqual(
+            sorted(row['title'] for row in rows),
+            sorted(
+                ["'=cmd|x", "'+1", "'-2", "'@SUM(A1)", "''=quoted", "Plain"],
+            ),
+        )
+        self.assertIn("'=HYPERLINK()", [row['tags'] for row in rows])
+
+        Recipe.objects.all().delete()
+        upload = SimpleUploadedFile("recipes.csv", content, "text/csv")
+        res = self.client.post(
+            IMPORT_URL, {'file': upload}, format='multipart',
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        imported = Recipe.objects.filter(user=self.user)
+        self.assertEqual(
+            sorted(recipe.title for recipe in imported), sorted(titles),
+        )
+        self.assertEqual(
+            [tag.name for tag in imported.get(title="Plain").tags.all()],
+            ["=HYPERLINK()"],
+        )
+
+    def test_import_unknown_format_error(self):
+        upload = SimpleUploadedFile("recipes.xml", b"<recipes/>", "text/xml")
+        res = self.client.post(
+            IMPORT_URL, {'file': upload}, format='multipart',
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
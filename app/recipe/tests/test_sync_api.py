@@ -0,0 +1,104 @@
+"""
+Tests for the incremental sync API.
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Tombstone
+from recipe import sync
+
+SYNC_URL = reverse('recipe:sync')
+
+
+class SyncApiTests(TestCase):
+    """Test the changes-since-token endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="test@example.com",
+            password="test@123"
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_first_sync_returns_everything(self):
+        recipe = Recipe.objects.create(user=self.user, title="Soup")
+        tag = Tag.objects.create(user=self.user, name="Hot")
+        other = get_user_model().objects.create_user(
+            email="other@example.com", password="test@123"
+        )
+        Recipe.objects.create(user=other, title="Theirs")
+
+        res = self.client.get(SYNC_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+        self.assertEqual([t['id'] for t in res.data['tags']], [tag.id])
+        self.assertTrue(res.data['token'])
+
+    def test_sync_returns_only_changes(self):
+        """Test a token limits the response to later changes and deletes"""
+        kept = Recipe.objects.create(user=self.user, title="Kept")
+        changed = Recipe.objects.create(user=self.user, title="Changed")
+        removed = Tag.objects.create(user=self.user, name="Removed")
+        long_ago = timezone.now() - timedelta(hours=1)
+        Recipe.objects.all().update(updated_at=long_ago)
+        Tag.objects.all().update(updated_at=long_ago)
+        later = long_ago + timedelta(minutes=1)
+        with patch('recipe.views.timezone.now', return_value=later):
+            token = self.client.get(SYNC_URL).data['token']
+
+        changed.title = "Changed again"
+        changed.save()
+        removed_id = removed.id
+        removed.delete()
+        res = self.client.get(SYNC_URL, {'since': token})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data['recipes']], [changed.id])
+        self.assertNotIn(kept.id, [r['id'] for r in res.data['recipes']])
+        self.assertEqual(
+            res.data['deleted'], {'recipes': [], 'tags': [removed_id]},
+        )
+
+    def test_invalid_token_error(self):
+        res = self.client.get(SYNC_URL, {'since': 'garbage'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_token_gone(self):
+        """Test tokens older than the tombstone retention need a resync"""
+        with self.settings(RECIPE_SYNC_TOMBSTONE_DAYS=1):
+            token = sync.make_token(timezone.now() - timedelta(days=2))
+            res = self.client.get(SYNC_URL, {'since': token})
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+
+    def test_deleting_user_keeps_tombstones_consistent(self):
+        """Test cascading a user's recipes into tombstones doesn't fail"""
+        Recipe.objects.create(user=self.user, title="Soup")
+        self.user.delete()
+        self.assertEqual(
+            Tombstone.objects.filter(kind=Tombstone.RECIPE).count(), 1,
+        )
+
+    def test_prune_tombstones(self):
+        Tombstone.objects.create(
+            user_id=self.user.id, kind=Tombstone.TAG, object_id=1,
+        )
+        Tombstone.objects.update(
+            deleted_at=timezone.now() - timedelta(days=90),
+        )
+        Tombstone.objects.create(
+            user_id=self.user.id, kind=Tombstone.TAG, object_id=2,
+        )
+        call_command('prune_tombstones', stdout=StringIO())
+        self.assertEqual(
+            list(Tombstone.objects.values_list('object_id', flat=True)), [2]
+        )
@@ -42,7 +42,7 @@ class PrivateTagsApiTests(TestCase):
         tags = Tag.objects.all().order_by("-name")
         serializer = TagSerializer(tags, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_tag_limited_to_user(self):
         user_two = create_user(email="user2@example.com")
@@ -50,9 +50,9 @@ class PrivateTagsApiTests(TestCase):
         tag = Tag.objects.create(user=self.user, name="Protien")
         res = self.client.get(TAGS_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]['name'], tag.name)
-        self.assertEqual(res.data[0]['id'], tag.id)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['name'], tag.name)
+        self.assertEqual(res.data['results'][0]['id'], tag.id)
 
     
     def test_update_tag(self):
@@ -73,6 +73,17 @@ class PrivateTagsApiTests(TestCase):
         tag = Tag.objects.filter(user=self.user)
         self.assertFalse(tag.exists())
 
-   
-       
+    def test_retrieve_tag_not_allowed(self):
+        """Test tags have no detail GET, only update and delete"""
+        tag = Tag.objects.create(name="Vegan", user=self.user)
+        res = self.client.get(detail_url(tag_id=tag.id))
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertNotIn('GET', res['Allow'])
 
+    def test_rename_tag_to_existing_name_error(self):
+        Tag.objects.create(name="Dessert", user=self.user)
+        tag = Tag.objects.create(name="After dinner", user=self.user)
+        res = self.client.patch(detail_url(tag_id=tag.id), {"name": "Dessert"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, "After dinner")
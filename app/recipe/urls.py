@@ -12,5 +12,6 @@ router.register('tags', views.TagViewSet,  basename='tag')
 
 app_name="recipe"
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('sync/', views.SyncView.as_view(), name='sync'),
 ]
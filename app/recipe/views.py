@@ -1,33 +1,330 @@
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from rest_framework import (viewsets,
-                             mixins
+                            mixins,
+                            status
                             )
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import IsAuthenticated
-from core.models import (Recipe, Tag)
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from core.models import (Recipe, Tag, Tombstone)
+from recipe import sync
+from recipe.cache import CachedListMixin, CachedResponseMixin
+from recipe.conditional import ConditionalGetMixin, ConditionalListMixin
+from recipe.filters import filter_recipes
+from recipe.importers import READERS, detect_format
+from recipe.plans import FastListMixin
+from recipe.renderers import CSVRenderer, NDJSONRenderer
+from recipe.search import get_backend
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer, TagSerializer
+from user.authentication import (
+    CachedTokenAuthentication,
+    StatelessJWTAuthentication,
+)
 
 """Views for recipe"""
+
+
+def tags_prefetch():
+    """Prefetch loading only the tag fields the serializers render.
+
+    Ordered by id, like the tags rendered by recipe.plans.
+    """
+    return Prefetch(
+        'tags', queryset=Tag.objects.only('id', 'name').order_by('id'),
+    )
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over the newest recipes first"""
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class TagCursorPagination(RecipeCursorPagination):
+    """Keyset pagination over tags in reverse name order"""
+    ordering = ('-name', 'id')
+
+
 # Create your views here.
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, CachedResponseMixin, FastListMixin,
+                    viewsets.ModelViewSet):
     serializer_class = RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication, StatelessJWTAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    search_limit = 20
+    max_search_limit = 100
+    export_chunk_size = 1000
+    import_batch_size = 500
+    max_reported_rejections = 100
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user).order_by('-id') 
+        # Scope by id so a stateless token user needs no users table query.
+        queryset = self.queryset.filter(
+            user_id=self.request.user.id,
+        ).order_by('-id')
+        if self.action in ('list', 'export'):
+            queryset = filter_recipes(queryset, self.request.query_params)
+        if self.action in ('destroy', 'bulk', 'export', 'import_recipes'):
+            return queryset
+        queryset = queryset.prefetch_related(tags_prefetch())
+        if self.action in ('list', 'search'):
+            # RecipeSerializer never renders the description.
+            queryset = queryset.defer('description')
+        return queryset
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'search'):
             return RecipeSerializer
         return self.serializer_class
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Return the user's recipes matching ?q=, best matches first"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': ['This parameter is required.']})
+        limit = self.search_limit
+        try:
+            limit = min(
+                int(request.query_params.get('limit', limit)),
+                self.max_search_limit,
+            )
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+
+        recipe_ids = get_backend().search(
+            request.user.id, query, max(limit, 1),
+        )
+        recipes = self.get_queryset().in_bulk(recipe_ids)
+        ranked = [
+            recipes[recipe_id] for recipe_id in recipe_ids
+            if recipe_id in recipes
+        ]
+        serializer = self.get_serializer(ranked, many=True)
+        return Response(serializer.data)
     
     def perform_create(self, serializer):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    def _iter_chunks(self, queryset):
+        """Yield lists of recipes with their tags, one chunk at a time"""
+        chunk = []
+        for recipe in queryset.iterator(chunk_size=self.export_chunk_size):
+            chunk.append(recipe)
+            if len(chunk) == self.export_chunk_size:
+                prefetch_related_objects(chunk, tags_prefetch())
+                yield chunk
+                chunk = []
+        if chunk:
+            prefetch_related_objects(chunk, tags_prefetch())
+            yield chunk
+
+    @action(
+        detail=False, methods=['get'],
+        renderer_classes=[NDJSONRenderer, CSVRenderer],
+    )
+    def export(self, request):
+        """Stream every recipe of the user as NDJSON or CSV (?format=)"""
+        renderer = request.accepted_renderer
+        serializer = self.get_serializer()
+        items = (
+            serializer.to_representation(recipe)
+            for chunk in self._iter_chunks(self.get_queryset())
+            for recipe in chunk
+        )
+        response = StreamingHttpResponse(
+            renderer.stream(items, list(serializer.fields)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{renderer.format}"'
+        )
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_recipes(self, request):
+        """Import recipes from an uploaded NDJSON or CSV file.
+
+        The file is read row by row and written in batches, so memory
+        use doesn't grow with its size. Invalid rows are skipped and
+        reported.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+        file_format = detect_format(upload)
+        if file_format is None:
+            raise ValidationError(
+                {'file': ['Expected a .ndjson or .csv file.']},
+            )
+
+        started = time.monotonic()
+        list_serializer = self.get_serializer(many=True)
+        imported = 0
+        rejected = 0
+        rejections = []
+        batch = []
+        for line_no, item, errors in READERS[file_format](upload):
+            if errors is None:
+                serializer = self.get_serializer(data=item)
+                if serializer.is_valid():
+                    batch.append(
+                        {**serializer.validated_data, 'user': request.user},
+                    )
+                    if len(batch) == self.import_batch_size:
+                        imported += len(list_serializer.create(batch))
+                        batch = []
+                    continue
+                errors = serializer.errors
+            rejected += 1
+            if len(rejections) < self.max_reported_rejections:
+                rejections.append({'line': line_no, 'errors': errors})
+        if batch:
+            imported += len(list_serializer.create(batch))
+
+        elapsed = time.monotonic() - started
+        rows = imported + rejected
+        return Response({
+            'imported': imported,
+            'rejected': rejected,
+            'rejections': rejections,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(rows / elapsed, 1) if elapsed else None,
+        })
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        """Create, update or delete a list of recipes in one transaction.
+
+        POST takes recipes, PATCH takes partial recipes carrying their id
+        and DELETE takes recipe ids. The response holds one status per
+        item, in request order. Creates and updates are all or nothing.
+        """
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError(
+                {'non_field_errors': ['Expected a non-empty list of items.']},
+            )
+        max_items = settings.RECIPE_BULK_MAX_ITEMS
+        if len(items) > max_items:
+            raise ValidationError({'non_field_errors': [
+                f'Ensure this list has at most {max_items} items.'
+            ]})
+        if request.method == 'DELETE':
+            response = self._bulk_delete(items)
+        elif request.method == 'PATCH':
+            response = self._bulk_update(items)
+        else:
+            response = self._bulk_create(items)
+        return response
+
+    def _bulk_errors(self, errors):
+        """Build the response for a batch rejected by validation"""
+        results = [
+            {'index': index, 'status': 'invalid', 'errors': item_errors}
+            if item_errors else {'index': index, 'status': 'skipped'}
+            for index, item_errors in enumerate(errors)
+        ]
+        return Response(
+            {'results': results}, status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def _bulk_ids(self, items):
+        """Return the recipe ids in items, None where an id is malformed"""
+        ids = []
+        for item in items:
+            value = item.get('id') if isinstance(item, dict) else item
+            valid = isinstance(value, int) and not isinstance(value, bool)
+            ids.append(value if valid else None)
+        return ids
+
+    def _bulk_create(self, items):
+        serializer = self.get_serializer(data=items, many=True)
+        if not serializer.is_valid():
+            return self._bulk_errors(serializer.errors)
+        recipes = serializer.save(user=self.request.user)
+        results = [
+            {'index': index, 'status': 'created', 'id': recipe.id}
+            for index, recipe in enumerate(recipes)
+        ]
+        return Response({'results': results}, status=status.HTTP_201_CREATED)
+
+    def _bulk_update(self, items):
+        ids = self._bulk_ids(items)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id in ids if recipe_id is not None],
+        )
+        errors = []
+        seen = set()
+        for recipe_id in ids:
+            if recipe_id is None:
+                errors.append({'id': ['A valid integer is required.']})
+            elif recipe_id not in recipes:
+                errors.append({'id': ['Not found.']})
+            elif recipe_id in seen:
+                errors.append({'id': ['Duplicate id in this batch.']})
+            else:
+                errors.append({})
+            seen.add(recipe_id)
+        if any(errors):
+            return self._bulk_errors(errors)
+
+        instances = [recipes[recipe_id] for recipe_id in ids]
+        serializer = self.get_serializer(
+            instances, data=items, many=True, partial=True,
+        )
+        if not serializer.is_valid():
+            return self._bulk_errors(serializer.errors)
+        serializer.save()
+        results = [
+            {'index': index, 'status': 'updated', 'id': recipe_id}
+            for index, recipe_id in enumerate(ids)
+        ]
+        return Response({'results': results})
+
+    def _bulk_delete(self, items):
+        ids = self._bulk_ids(items)
+        valid_ids = [recipe_id for recipe_id in ids if recipe_id is not None]
+        with transaction.atomic():
+            recipes = self.get_queryset().filter(id__in=valid_ids)
+            found = set(recipes.values_list('id', flat=True))
+            recipes.delete()
+        results = []
+        for index, recipe_id in enumerate(ids):
+            if recipe_id is None:
+                result = {
+                    'status': 'invalid',
+                    'errors': {'id': ['A valid integer is required.']},
+                }
+            elif recipe_id in found:
+                result = {'status': 'deleted', 'id': recipe_id}
+            else:
+                result = {'status': 'not_found', 'id': recipe_id}
+            results.append({'index': index, **result})
+        return Response({'results': results})
+
+
 class TagViewSet(
+    ConditionalListMixin,
+    CachedListMixin,
+    FastListMixin,
     mixins.DestroyModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
@@ -35,9 +332,77 @@ class TagViewSet(
       ):
     """Viewset for listing tags filtered by authenticated user."""
     serializer_class = TagSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [
+        CachedTokenAuthentication, StatelessJWTAuthentication,
+    ]
     permission_classes = [IsAuthenticated]
+    pagination_class = TagCursorPagination
 
     def get_queryset(self):
         """Return tags for the authenticated user only."""
-        return Tag.objects.filter(user=self.request.user).order_by('-name')
\ No newline at end of file
+        return Tag.objects.filter(
+            user_id=self.request.user.id,
+        ).order_by('-name', 'id')
+
+    def perform_update(self, serializer):
+        """Reject renaming a tag to a name the user already has."""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError(
+                {'name': ['A tag with this name already exists.']},
+            )
+
+
+class SyncView(APIView):
+    """Return the recipes and tags changed or deleted since ?since=<token>.
+
+    Without a token every recipe and tag is returned. Each response
+    carries the token to send as since on the next call.
+    """
+    authentication_classes = [
+        CachedTokenAuthentication, StatelessJWTAuthentication,
+    ]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        now = timezone.now()
+        user = request.user
+        recipes = Recipe.objects.filter(
+            user_id=user.id,
+        ).prefetch_related(tags_prefetch())
+        tags = Tag.objects.filter(user_id=user.id)
+        deleted = {Tombstone.RECIPE: [], Tombstone.TAG: []}
+
+        token = request.query_params.get('since')
+        if token:
+            try:
+                since = sync.read_token(token)
+            except sync.InvalidToken:
+                raise ValidationError({'since': ['Invalid sync token.']})
+            if sync.is_expired(since):
+                return Response(
+                    {'detail': 'Sync token expired, sync again without one.'},
+                    status=status.HTTP_410_GONE,
+                )
+            start = sync.changes_since(since)
+            recipes = recipes.filter(updated_at__gte=start)
+            tags = tags.filter(updated_at__gte=start)
+            tombstones = Tombstone.objects.filter(
+                user_id=user.id, deleted_at__gte=start
+            ).values_list('kind', 'object_id')
+            for kind, object_id in tombstones:
+                deleted[kind].append(object_id)
+
+        return Response({
+            'recipes': RecipeDetailSerializer(
+                recipes.order_by('id'), many=True,
+            ).data,
+            'tags': TagSerializer(tags.order_by('id'), many=True).data,
+            'deleted': {
+                'recipes': deleted[Tombstone.RECIPE],
+                'tags': deleted[Tombstone.TAG],
+            },
+            'token': sync.make_token(now),
+        })
@@ -0,0 +1,250 @@
+"""
+Authentication classes caching the user lookup of each request
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from core.models import RevokedUser
+
+
+class UserLRUCache:
+    """Thread-safe LRU cache of per-user values with a TTL.
+
+    Entries are indexed by user id as well, so every entry of a user can
+    be dropped when the user changes. Invalidation only reaches the
+    current process; the TTL bounds how long other processes may keep
+    serving a stale entry.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user_id, value, expires = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, user_id, value):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (user_id, value, time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def discard_user(self, user_id):
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_user.get(entry[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[entry[0]]
+
+
+user_cache = UserLRUCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl=settings.AUTH_CACHE_TTL,
+)
+
+
+def invalidate_user(user_id):
+    """Forget every cached authentication of user_id."""
+    user_cache.discard_user(user_id)
+
+
+def invalidate_token(key):
+    """Forget the cached authentication of an auth token key."""
+    user_cache.discard(('token', key))
+
+
+class RevokedUsers:
+    """Per-process copy of the RevokedUser ids, reloaded every ttl seconds.
+
+    The whole set is reloaded at once, so no single revocation can be
+    evicted; a revocation made in another process is seen within ttl.
+    While one thread reloads, the others keep using the previous set.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._ids = frozenset()
+        self._expires = 0
+        self._loaded = False
+        # Bumped by reset() so a reload racing it can't mark itself fresh.
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def __contains__(self, user_id):
+        if self._expires <= time.monotonic():
+            self._reload()
+        return user_id in self._ids
+
+    def _reload(self):
+        # Only the very first load is waited for.
+        if not self._load_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            with self._lock:
+                if self._expires > time.monotonic():
+                    return
+                generation = self._generation
+            cutoff = timezone.now() - jwt_settings.ACCESS_TOKEN_LIFETIME
+            ids = frozenset(
+                RevokedUser.objects.filter(revoked_at__gt=cutoff)
+                .values_list('user_id', flat=True)
+            )
+            with self._lock:
+                self._ids = ids
+                self._loaded = True
+                if self._generation == generation:
+                    self._expires = time.monotonic() + self.ttl
+        finally:
+            self._load_lock.release()
+
+    def reset(self):
+        with self._lock:
+            self._expires = 0
+            self._generation += 1
+
+
+revoked_users = RevokedUsers(ttl=settings.AUTH_REVOCATION_TTL)
+
+
+def revoke_user(user_id):
+    """Reject user_id's stateless tokens until they would have expired."""
+    now = timezone.now()
+    RevokedUser.objects.update_or_create(
+        user_id=user_id, defaults={'revoked_at': now},
+    )
+    # Revocations older than any token still accepted are useless.
+    RevokedUser.objects.filter(
+        revoked_at__lte=now - jwt_settings.ACCESS_TOKEN_LIFETIME,
+    ).delete()
+    revoked_users.reset()
+
+
+def unrevoke_user(user_id):
+    RevokedUser.objects.filter(user_id=user_id).delete()
+    revoked_users.reset()
+
+
+def is_revoked(user_id):
+    return user_id in revoked_users
+
+
+def token_user_id(validated_token):
+    """The user id claim of validated_token as the user id field's type.
+
+    simplejwt 5.4+ issues the claim as a string, so it is converted
+    before being compared with or used as a key next to database ids.
+    """
+    user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+    if user_id is None:
+        return None
+    field = get_user_model()._meta.get_field(jwt_settings.USER_ID_FIELD)
+    try:
+        return field.to_python(user_id)
+    except ValidationError:
+        raise InvalidToken(
+            'Token contained no recognizable user identification',
+        )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication skipping the Token/User query on cache hits"""
+
+    def authenticate_credentials(self, key):
+        cached = user_cache.get(('token', key))
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            user_cache.set(('token', key), cached[0].pk, cached)
+        user, token = cached
+        # Hand out copies so one request can't mutate another's user.
+        return copy.copy(user), token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication skipping the User query on cache hits"""
+
+    def get_user(self, validated_token):
+        user_id = token_user_id(validated_token)
+        user = None
+        if user_id is not None:
+            user = user_cache.get(('jwt', user_id))
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(('jwt', user_id), user.pk, user)
+        return copy.copy(user)
+
+
+class StatelessJWTAuthentication(CachedJWTAuthentication):
+    """JWT authentication answering safe requests from the token claims.
+
+    With settings.JWT_STATELESS_READS on, GET/HEAD/OPTIONS requests whose
+    token carries the is_active claim get a TokenUser built from the
+    claims, without any users table query. Deactivated and deleted
+    users are refused through the RevokedUser table, read by each process
+    every AUTH_REVOCATION_TTL seconds. Other requests and older tokens
+    load the full user.
+    """
+
+    def authenticate(self, request):
+        self.safe_request = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        if not (settings.JWT_STATELESS_READS and self.safe_request
+                and 'is_active' in validated_token):
+            return super().get_user(validated_token)
+
+        user = jwt_settings.TOKEN_USER_CLASS(validated_token)
+        if (not validated_token['is_active']
+                or is_revoked(token_user_id(validated_token))):
+            raise AuthenticationFailed(
+                'User is inactive', code='user_inactive',
+            )
+        return user
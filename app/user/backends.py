@@ -0,0 +1,161 @@
+"""
+Authentication backend verifying passwords off the request thread
+"""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import get_hasher, identify_hasher
+from django.core.exceptions import PermissionDenied
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+# Hashes running or queued in _pool; see run_hash().
+_slots = None
+_pool_lock = threading.Lock()
+
+
+class LoginBusy(PermissionDenied):
+    """Raised by run_hash() when the pool and its queue are full.
+
+    As a PermissionDenied, authenticate() turns it into a failed login
+    for callers such as the admin; the backend also sets login_busy on
+    the request so the token view can answer with a 503 instead.
+    """
+
+
+def _hasher_path(hasher):
+    return f'{type(hasher).__module__}.{type(hasher).__qualname__}'
+
+
+def _verify(hasher_path, password, encoded):
+    return import_string(hasher_path)().verify(password, encoded)
+
+
+def _encode(hasher_path, password):
+    hasher = import_string(hasher_path)()
+    return hasher.encode(password, hasher.salt())
+
+
+def get_pool():
+    """Return the shared (pool, slots), or (None, None) to hash inline."""
+    global _pool, _slots
+    workers = settings.PASSWORD_VERIFY_WORKERS
+    if not workers:
+        return None, None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _slots = threading.BoundedSemaphore(
+                workers + settings.PASSWORD_VERIFY_QUEUE,
+            )
+        return _pool, _slots
+
+
+def _drop_pool(pool):
+    """Forget a broken pool so the next hash starts a new one."""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is pool:
+            _pool = _slots = None
+    logger.warning('Password hashing pool broke; starting a new one')
+    pool.shutdown(wait=False)
+
+
+def run_hash(func, *args):
+    """Run a hashing function in the pool, or inline without one.
+
+    At most PASSWORD_VERIFY_WORKERS + PASSWORD_VERIFY_QUEUE hashes wait
+    on the pool at once; beyond that LoginBusy is raised at once rather
+    than tying up another request thread. A pool broken by a dead
+    worker is replaced, and the hash that found it broken runs inline.
+    """
+    pool, slots = get_pool()
+    if pool is None:
+        return func(*args)
+    if not slots.acquire(blocking=False):
+        raise LoginBusy()
+    try:
+        future = pool.submit(func, *args)
+    except BrokenProcessPool:
+        slots.release()
+        _drop_pool(pool)
+        return func(*args)
+    except BaseException:
+        slots.release()
+        raise
+    # Free the slot when the hash ends, even if this thread stops waiting.
+    future.add_done_callback(lambda future: slots.release())
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        _drop_pool(pool)
+        return func(*args)
+
+
+def verify_password(user, password):
+    """Check password against user's hash, rehashing outdated hashes.
+
+    The hash runs in the process pool. When the hash was made with an
+    older hasher or cost, the password is rehashed with the preferred
+    hasher and saved.
+    """
+    encoded = user.password
+    if password is None or not encoded:
+        return False
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+
+    if not run_hash(_verify, _hasher_path(hasher), password, encoded):
+        return False
+
+    preferred = get_hasher('default')
+    if (hasher.algorithm != preferred.algorithm
+            or preferred.must_update(encoded)):
+        user.password = run_hash(_encode, _hasher_path(preferred), password)
+        user.save(update_fields=['password'])
+    return True
+
+
+class PooledModelBackend(ModelBackend):
+    """ModelBackend hashing passwords in a bounded process pool.
+
+    PASSWORD_VERIFY_WORKERS caps the processes doing the hashing, so a
+    burst of logins can't hold the GIL of the threads serving other
+    requests, and PASSWORD_VERIFY_QUEUE caps the logins waiting for
+    them; further logins fail at once instead of holding a request
+    thread, and are flagged with request.login_busy.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        try:
+            return self._authenticate(request, username, password, **kwargs)
+        except LoginBusy:
+            if request is not None:
+                request.login_busy = True
+            raise
+
+    def _authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so response times don't reveal which emails exist.
+            run_hash(_encode, _hasher_path(get_hasher('default')), password)
+            return None
+        if (verify_password(user, password)
+                and self.user_can_authenticate(user)):
+            return user
+        return None
@@ -0,0 +1,54 @@
+"""
+Django command to measure password verification throughput.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import get_hasher
+from django.core.management.base import BaseCommand
+
+from user.backends import _hasher_path, _verify
+
+
+class Command(BaseCommand):
+    """Report logins per second with the preferred password hasher."""
+    help = 'Time password verification inline and across a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=50)
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes for the pooled run.',
+        )
+
+    def handle(self, *args, **options):
+        logins = options['logins']
+        workers = options['workers']
+        hasher = get_hasher('default')
+        path = _hasher_path(hasher)
+        encoded = hasher.encode('benchmark-password', hasher.salt())
+        self.stdout.write(f'Hasher: {path}')
+
+        start = time.perf_counter()
+        for _ in range(logins):
+            _verify(path, 'benchmark-password', encoded)
+        per_core = logins / (time.perf_counter() - start)
+        self.stdout.write(f'Inline: {per_core:.1f} logins/s per core')
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Start the workers before timing.
+            list(pool.map(
+                _verify, [path] * workers, ['x'] * workers,
+                [encoded] * workers,
+            ))
+            start = time.perf_counter()
+            list(pool.map(
+                _verify, [path] * logins,
+                ['benchmark-password'] * logins, [encoded] * logins,
+            ))
+            pooled = logins / (time.perf_counter() - start)
+        self.stdout.write(
+            f'Pooled ({workers} workers): {pooled:.1f} logins/s, '
+            f'{pooled / workers:.1f} per worker'
+        )
@@ -5,6 +5,7 @@ from django.contrib.auth import (
     )
 from django.utils.translation import gettext as _
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -52,3 +53,13 @@ class AuthTokenSerializer(serializers.Serializer):
         attrs['user'] = user
         return attrs
 
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Issue tokens carrying the claims the stateless JWT path relies on"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['is_active'] = user.is_active
+        token['is_staff'] = user.is_staff
+        return token
@@ -0,0 +1,46 @@
+"""Signal handlers invalidating cached authentications"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import (
+    invalidate_token,
+    invalidate_user,
+    revoke_user,
+    unrevoke_user,
+)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_authentications(sender, instance, **kwargs):
+    """Forget cached users on any change, e.g. a new password."""
+    invalidate_user(instance.pk)
+
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def remember_is_active(sender, instance, **kwargs):
+    instance._was_active = instance.is_active
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revoke_inactive_user(sender, instance, created, **kwargs):
+    """Keep deactivated users out of the stateless JWT fast path."""
+    if not instance.is_active:
+        revoke_user(instance.pk)
+    elif created or not instance._was_active:
+        # On reactivation (or a reused id), not on every save such as
+        # the last_login update of each login.
+        unrevoke_user(instance.pk)
+    instance._was_active = instance.is_active
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def revoke_deleted_user(sender, instance, **kwargs):
+    revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token_authentication(sender, instance, **kwargs):
+    invalidate_token(instance.key)
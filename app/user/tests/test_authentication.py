@@ -0,0 +1,305 @@
+"""
+Tests for the cached authentication classes.
+"""
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import RevokedUser
+
+from user.authentication import (
+    CachedJWTAuthentication,
+    UserLRUCache,
+    is_revoked,
+    revoke_user,
+    revoked_users,
+    user_cache,
+)
+from user.serializers import ClaimsTokenObtainPairSerializer
+
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_user(**params):
+    return get_user_model().objects.create_user(**params)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token authentication with a cached user lookup."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = create_user(email="test@example.com", password="test@123")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_user_query(self):
+        """Test a repeated token request runs no authentication query"""
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_200_OK,
+        )
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deactivated_user_rejected(self):
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        """Test changing the password through the API drops cached users"""
+        self.client.get(ME_URL)
+        res = self.client.patch(ME_URL, {'password': 'newpass123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(user_cache.get(('token', self.token.key)))
+
+    def test_deleted_token_rejected(self):
+        self.client.get(ME_URL)
+        self.token.delete()
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Test JWT authentication with a cached user lookup."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = create_user(email="test@example.com", password="test@123")
+        token = AccessToken.for_user(self.user)
+        self.request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+
+    def test_second_authentication_skips_user_query(self):
+        authentication = CachedJWTAuthentication()
+        user, _ = authentication.authenticate(self.request)
+        self.assertEqual(user, self.user)
+        with self.assertNumQueries(0):
+            user, _ = authentication.authenticate(self.request)
+        self.assertEqual(user, self.user)
+
+    def test_string_claim_shares_cache_entry(self):
+        token = AccessToken.for_user(self.user)
+        token[jwt_settings.USER_ID_CLAIM] = str(self.user.pk)
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        authentication = CachedJWTAuthentication()
+        authentication.authenticate(request)
+        with self.assertNumQueries(0):
+            user, _ = authentication.authenticate(request)
+        self.assertEqual(user, self.user)
+
+    def test_deactivated_user_rejected(self):
+        authentication = CachedJWTAuthentication()
+        authentication.authenticate(self.request)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate(self.request)
+
+
+@override_settings(JWT_STATELESS_READS=True)
+class StatelessJWTAuthenticationTests(TestCase):
+    """Test safe requests authenticated from JWT claims alone."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = create_user(email="test@example.com", password="test@123")
+        token = ClaimsTokenObtainPairSerializer.get_token(
+            self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def user_queries(self, method):
+        with CaptureQueriesContext(connection) as queries:
+            res = method(RECIPES_URL)
+        table = get_user_model()._meta.db_table
+        return res, [q['sql'] for q in queries if table in q['sql']]
+
+    def test_token_carries_claims(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user)
+        self.assertTrue(token['is_active'])
+        self.assertFalse(token['is_staff'])
+
+    def test_read_skips_user_query(self):
+        res, queries = self.user_queries(self.client.get)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries, [])
+
+    def test_write_loads_user(self):
+        user_cache.clear()
+        res, queries = self.user_queries(self.client.post)
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(queries, [])
+
+    @override_settings(JWT_STATELESS_READS=False)
+    def test_disabled_loads_user(self):
+        res, queries = self.user_queries(self.client.get)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(queries, [])
+
+    def test_deactivated_user_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertTrue(is_revoked(self.user.id))
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_string_claim_revoked(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(
+            self.user).access_token
+        token[jwt_settings.USER_ID_CLAIM] = str(self.user.pk)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        revoke_user(self.user.id)
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_reactivated_user_accepted(self):
+        self.user.is_active = False
+        self.user.save()
+        self.user.is_active = True
+        self.user.save()
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_active_user_save_skips_unrevoke(self):
+        """Test saving an active user, e.g. on login, writes no revocation"""
+        with CaptureQueriesContext(connection) as queries:
+            self.user.last_login = timezone.now()
+            self.user.save(update_fields=['last_login'])
+            get_user_model().objects.get(pk=self.user.pk).save()
+        self.assertFalse([
+            q for q in queries.captured_queries
+            if 'core_revokeduser' in q['sql']
+        ])
+
+    def test_reused_id_not_revoked(self):
+        user_id = self.user.id
+        self.user.delete()
+        user = create_user(
+            id=user_id, email="new@example.com", password="test@123",
+        )
+        self.assertFalse(is_revoked(user.id))
+
+    def test_reactivating_a_loaded_user_unrevokes(self):
+        self.user.is_active = False
+        self.user.save()
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.is_active = True
+        user.save()
+        self.assertFalse(RevokedUser.objects.filter(user_id=user.pk).exists())
+        self.assertFalse(is_revoked(user.pk))
+
+    def test_reload_racing_reset_stays_stale(self):
+        """Test a revocation during a reload is picked up on the next check"""
+        revoked_users.reset()
+        real_filter = RevokedUser.objects.filter
+
+        def filter_then_revoke(*args, **kwargs):
+            rows = list(
+                real_filter(*args, **kwargs).values_list('user_id', flat=True),
+            )
+            RevokedUser.objects.create(
+                user_id=self.user.id, revoked_at=timezone.now(),
+            )
+            revoked_users.reset()
+            return mock.Mock(values_list=mock.Mock(return_value=rows))
+
+        with mock.patch.object(
+            RevokedUser.objects, 'filter', filter_then_revoke,
+        ):
+            self.assertFalse(is_revoked(self.user.id))
+        self.assertTrue(is_revoked(self.user.id))
+
+    def test_cache_eviction_keeps_revocation(self):
+        """Test filling the Django cache can't un-revoke a user"""
+        revoke_user(self.user.id)
+        for i in range(400):
+            cache.set(f'filler:{i}', i)
+        cache.clear()
+        revoked_users.reset()
+        self.assertTrue(is_revoked(self.user.id))
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revocation_from_another_process(self):
+        """Test a revocation row written elsewhere is seen after the TTL"""
+        self.assertFalse(is_revoked(self.user.id))
+        RevokedUser.objects.create(
+            user_id=self.user.id, revoked_at=timezone.now(),
+        )
+        # Still the copy loaded above, until it expires.
+        self.assertFalse(is_revoked(self.user.id))
+        later = time.monotonic() + 60
+        with mock.patch('user.authentication.time.monotonic',
+                        return_value=later):
+            self.assertTrue(is_revoked(self.user.id))
+
+    def test_deleted_user_stays_revoked(self):
+        user_id = self.user.id
+        self.user.delete()
+        self.assertTrue(RevokedUser.objects.filter(user_id=user_id).exists())
+        self.assertTrue(is_revoked(user_id))
+
+    def test_expired_revocation_ignored(self):
+        lifetime = jwt_settings.ACCESS_TOKEN_LIFETIME
+        RevokedUser.objects.create(
+            user_id=self.user.id,
+            revoked_at=timezone.now() - lifetime - timedelta(seconds=1),
+        )
+        revoked_users.reset()
+        self.assertFalse(is_revoked(self.user.id))
+        revoke_user(self.user.id + 1)
+        self.assertFalse(
+            RevokedUser.objects.filter(user_id=self.user.id).exists(),
+        )
+
+
+class UserLRUCacheTests(TestCase):
+    """Test the bounds of the user cache."""
+
+    def test_least_recently_used_entry_evicted(self):
+        cache = UserLRUCache(max_entries=2, ttl=60)
+        cache.set('a', 1, 'A')
+        cache.set('b', 2, 'B')
+        cache.get('a')
+        cache.set('c', 3, 'C')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'A')
+
+    def test_expired_entry_dropped(self):
+        cache = UserLRUCache(max_entries=2, ttl=-1)
+        cache.set('a', 1, 'A')
+        self.assertIsNone(cache.get('a'))
+
+    def test_discard_user_drops_all_entries(self):
+        cache = UserLRUCache(max_entries=10, ttl=60)
+        cache.set('a', 1, 'A')
+        cache.set('b', 1, 'B')
+        cache.set('c', 2, 'C')
+        cache.discard_user(1)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get('c'), 'C')
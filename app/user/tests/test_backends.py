@@ -0,0 +1,159 @@
+"""
+Tests for the password hashers and the pooled authentication backend.
+"""
+import os
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import backends
+from user.hashers import ScryptPasswordHasher
+
+TOKEN_URL = reverse('user:token')
+JWT_URL = reverse('user_login')
+
+
+def create_user(**params):
+    return get_user_model().objects.create_user(**params)
+
+
+class ScryptPasswordHasherTests(TestCase):
+    """Test the scrypt hasher."""
+
+    def test_verify_round_trip(self):
+        hasher = ScryptPasswordHasher()
+        encoded = hasher.encode('secret', hasher.salt())
+        self.assertTrue(encoded.startswith('scrypt$'))
+        self.assertTrue(hasher.verify('secret', encoded))
+        self.assertFalse(hasher.verify('wrong', encoded))
+
+    def test_must_update_on_cost_change(self):
+        hasher = ScryptPasswordHasher()
+        encoded = hasher.encode('secret', hasher.salt(), n=2 ** 10)
+        self.assertTrue(hasher.must_update(encoded))
+        self.assertFalse(
+            hasher.must_update(hasher.encode('secret', hasher.salt())),
+        )
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'user.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+])
+class PooledModelBackendTests(TestCase):
+    """Test logging in through the pooled backend."""
+
+    def setUp(self):
+        self.user = create_user(email='test@example.com', password='test@123')
+
+    def test_authenticate(self):
+        user = authenticate(username='test@example.com', password='test@123')
+        self.assertEqual(user, self.user)
+
+    def test_wrong_password_rejected(self):
+        self.assertIsNone(
+            authenticate(username='test@example.com', password='nope'),
+        )
+
+    def test_unknown_user_rejected(self):
+        self.assertIsNone(
+            authenticate(username='nobody@example.com', password='test@123'),
+        )
+
+    def test_inactive_user_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(
+            authenticate(username='test@example.com', password='test@123'),
+        )
+
+    def test_old_hash_upgraded_on_login(self):
+        """Test a password hashed by an older hasher is rehashed"""
+        self.user.password = make_password('test@123', hasher='md5')
+        self.user.save()
+        self.assertIsNotNone(
+            authenticate(username='test@example.com', password='test@123'),
+        )
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+
+    @override_settings(PASSWORD_VERIFY_WORKERS=0)
+    def test_inline_verification(self):
+        user = authenticate(username='test@example.com', password='test@123')
+        self.assertEqual(user, self.user)
+
+    def test_full_queue_fails_fast(self):
+        """Test logins beyond the pool and its queue get a 503"""
+        _, slots = backends.get_pool()
+        held = 0
+        try:
+            while slots.acquire(blocking=False):
+                held += 1
+            self.assertEqual(held, 6)
+            # Django's own logins, e.g. the admin, just fail.
+            self.assertIsNone(
+                authenticate(username='test@example.com', password='test@123'),
+            )
+            res = self.client.post(reverse('admin:login'), {
+                'username': 'test@example.com', 'password': 'test@123',
+            })
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            res = APIClient().post(TOKEN_URL, {
+                'email': 'test@example.com', 'password': 'test@123',
+            })
+            self.assertEqual(
+                res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            self.assertEqual(res.data['detail'].code, 'login_busy')
+            self.assertEqual(res['Retry-After'], '1')
+        finally:
+            for _ in range(held):
+                slots.release()
+        self.assertEqual(
+            authenticate(username='test@example.com', password='test@123'),
+            self.user,
+        )
+
+    def test_full_queue_fails_fast_jwt(self):
+        """Test JWT logins beyond the pool and its queue get a 503"""
+        _, slots = backends.get_pool()
+        held = 0
+        try:
+            while slots.acquire(blocking=False):
+                held += 1
+            res = APIClient().post(JWT_URL, {
+                'email': 'test@example.com', 'password': 'test@123',
+            })
+            self.assertEqual(
+                res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+            self.assertEqual(res.data['detail'].code, 'login_busy')
+            self.assertEqual(res['Retry-After'], '1')
+        finally:
+            for _ in range(held):
+                slots.release()
+        res = APIClient().post(JWT_URL, {
+            'email': 'test@example.com', 'password': 'test@123',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('access', res.data)
+
+    def test_broken_pool_replaced(self):
+        """Test logins keep working after a pool worker dies"""
+        pool, _ = backends.get_pool()
+        with self.assertRaises(backends.BrokenProcessPool):
+            pool.submit(os._exit, 1).result()
+        self.assertEqual(
+            authenticate(username='test@example.com', password='test@123'),
+            self.user,
+        )
+        new_pool, _ = backends.get_pool()
+        self.assertIsNot(new_pool, pool)
+        self.assertEqual(
+            authenticate(username='test@example.com', password='test@123'),
+            self.user,
+        )
@@ -5,10 +5,17 @@ import requests
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
-from rest_framework import generics,authentication, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    ValidationError,
+)
 from rest_framework.settings import api_settings
 from rest_framework.pagination import LimitOffsetPagination
+from rest_framework_simplejwt.views import TokenObtainPairView
+from user.authentication import CachedTokenAuthentication
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer
@@ -19,6 +26,15 @@ class CustomLimitOffsetPagination(LimitOffsetPagination):
     default_limit = 3
     max_limit = 8
 
+
+class LoginUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many logins in progress, try again shortly.'
+    default_code = 'login_busy'
+    # Sent as Retry-After by DRF's exception handler.
+    wait = 1
+
+
 class CreateUserView(generics.CreateAPIView):
     """ Create a new user in the system """
     serializer_class = UserSerializer
@@ -28,6 +44,28 @@ class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except ValidationError:
+            # Set by user.backends when the password hashing queue is full.
+            if getattr(request, 'login_busy', False):
+                raise LoginUnavailable()
+            raise
+
+
+class CreateJWTView(TokenObtainPairView):
+    """Create a JWT pair for user, with a 503 when logins are busy"""
+
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            # Set by user.backends when the password hashing queue is full.
+            if getattr(request, 'login_busy', False):
+                raise LoginUnavailable()
+            raise
+
 # @api_view(['GET'])
 # def get_user_data(request):
 #     response = requests.get('https://jsonplaceholder.typicode.com/users').json()
@@ -84,7 +122,7 @@ class CreateTokenView(ObtainAuthToken):
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):